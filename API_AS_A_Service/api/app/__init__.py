@@ -2,26 +2,89 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask_compress import Compress
+from sqlalchemy import event
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 import logging
+import os
 
 db = SQLAlchemy()
 migrate = Migrate()
+compress = Compress()
 from app.models import db
+from app.json_provider import OrjsonProvider
+
+
+def _load_jwt_private_key(allow_ephemeral):
+    """Clave EdDSA: PEM en JWT_PRIVATE_KEY_FILE o, solo en desarrollo, una efímera.
+
+    Nunca se deriva de un secreto del repositorio (permitiría falsificar tokens).
+    La clave efímera cambia en cada arranque y es distinta en cada worker: con
+    varios workers de gunicorn un token emitido por uno lo rechazan los demás.
+    """
+    key_file = os.environ.get('JWT_PRIVATE_KEY_FILE')
+    if key_file:
+        with open(key_file, 'rb') as f:
+            return serialization.load_pem_private_key(f.read(), password=None)
+    if not allow_ephemeral:
+        raise RuntimeError(
+            "JWT_PRIVATE_KEY_FILE is not set. Point it to an Ed25519 PEM key shared by all workers "
+            "(or set FLASK_DEBUG=1 to use an ephemeral key in development)."
+        )
+    logging.getLogger(__name__).warning(
+        "JWT_PRIVATE_KEY_FILE not set: using an ephemeral Ed25519 key. Tokens become "
+        "invalid on restart and are not shared between workers; configure a key file in production."
+    )
+    return Ed25519PrivateKey.generate()
+
+
+def _sqlite_pragmas(dbapi_conn, _connection_record):
+    """PRAGMAs de SQLite aplicados a cada conexión nueva del pool"""
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')       # lectores concurrentes + un escritor
+    cursor.execute('PRAGMA synchronous=NORMAL')     # menos fsync (durable ante caída del SO)
+    cursor.execute('PRAGMA mmap_size=268435456')    # 256 MiB de lecturas vía mmap
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-65536')      # 64 MiB de page cache
+    cursor.close()
 
 
 def create_app():
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'super-secret-key'  # cambiar en prod
     app.config['JWT_EXP_DELTA_SECONDS'] = 3600  # 1 hora
+    # Claves Ed25519 construidas una vez y reutilizadas por encode/decode
+    # Sin JWT_PRIVATE_KEY_FILE solo arranca en debug/testing (FLASK_DEBUG=1)
+    app.config['JWT_PRIV'] = _load_jwt_private_key(allow_ephemeral=app.debug or app.testing)
+    app.config['JWT_PUB'] = app.config['JWT_PRIV'].public_key()
+    # Pool de conexiones reutilizado por los workers de gunicorn
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
+    # Compresión de respuestas JSON (Brotli preferido sobre gzip)
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
 
     db.init_app(app)
     migrate.init_app(app, db)
-    # create tables
+    compress.init_app(app)
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _sqlite_pragmas)
 
+    # create tables: comando único (`flask init-db`), no en cada arranque de worker
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Crea las tablas de la base de datos"""
+        db.create_all()
+        logging.info("Database tables created")
 
     # Logging
     logging.basicConfig(level=logging.INFO,
@@ -1,10 +1,18 @@
 # app/routes.py
-from flask import Blueprint, request, jsonify, current_app
-from .models import User
-from .schemas import UserSchema
+from flask import Blueprint, Response, request, jsonify, current_app, g
+from .models import User, hash_password, verify_password
+from .schemas import UserSchema, _fast_load
 from . import db
 from functools import wraps
+from threading import RLock
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from sqlalchemy import func, select
+import hashlib
 import jwt
+import orjson
+import os
+import time
 from datetime import datetime, timedelta
 import logging
 
@@ -12,19 +20,86 @@ user_bp = Blueprint('user', __name__)
 user_schema = UserSchema()
 user_list_schema = UserSchema(many=True)
 
+# Cache de tokens ya verificados: token -> payload decodificado.
+# Solo se guardan tokens válidos; cada entrada se respeta hasta su 'exp'.
+_JWT_CACHE = TTLCache(maxsize=4096, ttl=3600)
+_JWT_LOCK = RLock()
+
+# Cache corto para el conteo total de usuarios (/user/count)
+_COUNT_CACHE = TTLCache(maxsize=1, ttl=30)
+_COUNT_LOCK = RLock()
+
+# Hilos para el KDF: argon2/_hashlib liberan el GIL y se solapan con el acceso a BD
+_HASH_POOL = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2, thread_name_prefix='pwhash')
+
+# Verificaciones exitosas recientes: digest(hash almacenado + contraseña) -> True.
+# Compromiso explícito: durante el TTL un login repetido no paga el KDF, a cambio
+# de mantener en memoria un digest rápido derivado de la contraseña. Solo se
+# cachean aciertos y la clave cambia si cambia el hash almacenado.
+_VERIFY_CACHE = TTLCache(maxsize=1024, ttl=60)
+_VERIFY_LOCK = RLock()
+
+
+def _check_credentials(password_hash, password):
+    if not isinstance(password, str):
+        return False
+    key = hashlib.blake2b(f"{password_hash}\0{password}".encode(), digest_size=32).digest()
+    with _VERIFY_LOCK:
+        if key in _VERIFY_CACHE:
+            return True
+    if not verify_password(password_hash, password):
+        return False
+    with _VERIFY_LOCK:
+        _VERIFY_CACHE[key] = True
+    return True
+
+
+def _static_error(message, status):
+    """Error estático: el cuerpo JSON se serializa una sola vez al importar"""
+    body = orjson.dumps({'error': message})
+
+    def build():
+        return Response(body, status=status, mimetype='application/json')
+    return build
+
+_ERR_TOKEN_MISSING = _static_error('Token missing', 401)
+_ERR_TOKEN_EXPIRED = _static_error('Token expired', 401)
+_ERR_INVALID_TOKEN = _static_error('Invalid token', 401)
+_ERR_INVALID_CREDENTIALS = _static_error('Invalid credentials', 401)
+_ERR_USER_NOT_FOUND = _static_error('User not found', 404)
+_ERR_USERNAME_EXISTS = _static_error('Username already exists', 409)
+_ERR_DUPLICATED_USERNAMES = _static_error('Duplicated usernames in request', 409)
+
+
+def _decode_token(token):
+    """Decodifica el JWT reutilizando el payload cacheado mientras no expire"""
+    with _JWT_LOCK:
+        payload = _JWT_CACHE.get(token)
+        if payload is not None:
+            if payload['exp'] > time.time():
+                return payload
+            _JWT_CACHE.pop(token, None)
+
+    # Puede lanzar ExpiredSignatureError / InvalidTokenError: los fallos no se cachean
+    payload = jwt.decode(token, current_app.config['JWT_PUB'], algorithms=['EdDSA'])
+    with _JWT_LOCK:
+        _JWT_CACHE[token] = payload
+    return payload
+
 # --- Decorador de autenticación ---
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('x-access-token')
         if not token:
-            return jsonify({'error': 'Token missing'}), 401
+            return _ERR_TOKEN_MISSING()
         try:
-            payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            payload = _decode_token(token)
         except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token expired'}), 401
+            return _ERR_TOKEN_EXPIRED()
         except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+            return _ERR_INVALID_TOKEN()
+        g.jwt_payload = payload  # claims disponibles para los handlers
         return f(*args, **kwargs)
     return decorated
 
@@ -33,41 +108,95 @@ def token_required(f):
 def create_user():
     try:
         data = request.get_json()
-        validated_data = user_schema.load(data)
+        validated_data = _fast_load(data)
     except Exception as e:
         logging.warning(f"Validation error: {e}")
         return jsonify({'error': str(e)}), 400
 
+    # Comprobar duplicados antes del KDF: un 409 no debe costar un hash completo
     if User.query.filter_by(username=validated_data['username']).first():
-        return jsonify({'error': 'Username already exists'}), 409
+        return _ERR_USERNAME_EXISTS()
 
     user = User(username=validated_data['username'])
-    user.set_password(validated_data['password'])
+    user.password_hash = hash_password(validated_data['password'])
     db.session.add(user)
     db.session.commit()
     logging.info(f"User created: {user.username}")
     return jsonify({'message': 'User created successfully'}), 201
 
+@user_bp.route('/users/bulk', methods=['POST'])
+def create_users_bulk():
+    # Alta masiva (seeding): una sola transacción para todo el lote
+    try:
+        data = request.get_json()
+        if not isinstance(data, list):
+            raise ValueError('Expected a JSON array of users')
+        validated = [_fast_load(item) for item in data]
+    except Exception as e:
+        logging.warning(f"Validation error: {e}")
+        return jsonify({'error': str(e)}), 400
+
+    usernames = [item['username'] for item in validated]
+    if len(set(usernames)) != len(usernames):
+        return _ERR_DUPLICATED_USERNAMES()
+    existing = db.session.scalars(
+        select(User.username).where(User.username.in_(usernames))
+    ).all()
+    if existing:
+        return jsonify({'error': 'Username already exists', 'usernames': existing}), 409
+
+    # El hash es CPU-bound y libera el GIL: se paraleliza en el pool
+    hashes = list(_HASH_POOL.map(hash_password, (item['password'] for item in validated)))
+
+    db.session.bulk_insert_mappings(User, [
+        {'username': username, 'password_hash': password_hash}
+        for username, password_hash in zip(usernames, hashes)
+    ])
+    db.session.commit()
+    logging.info(f"Users created in bulk: {len(usernames)}")
+    return jsonify({'message': 'Users created successfully', 'created': len(usernames)}), 201
+
 @user_bp.route('/user', methods=['GET'])
 @token_required
 def get_users():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    users = User.query.paginate(page=page, per_page=per_page, error_out=False)
-    result = user_list_schema.dump(users.items)
-    return jsonify({
-        'users': result,
-        'total': users.total,
-        'pages': users.pages,
-        'current_page': users.page
+    # Paginación por cursor (keyset): evita el COUNT(*) de paginate()
+    after_id = request.args.get('after_id', 0, type=int)
+    per_page = max(1, request.args.get('per_page', 10, type=int))
+    stmt = (select(User)
+            .where(User.id > after_id)
+            .order_by(User.id.asc())
+            .limit(per_page + 1))
+    rows = db.session.scalars(stmt).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    body = orjson.dumps({
+        'users': user_list_schema.dump(rows),
+        'next_cursor': rows[-1].id if has_next else None
     })
+    response = Response(body, mimetype='application/json')
+    # Revalidación por ETag: clientes repetidos reciben 304 sin cuerpo
+    response.set_etag(hashlib.blake2b(body, digest_size=8).hexdigest())
+    response.cache_control.private = True
+    response.cache_control.max_age = 5
+    return response.make_conditional(request)
+
+@user_bp.route('/user/count', methods=['GET'])
+@token_required
+def count_users():
+    # Total de usuarios con TTL corto para clientes que lo necesiten
+    with _COUNT_LOCK:
+        total = _COUNT_CACHE.get('users')
+        if total is None:
+            total = db.session.query(func.count(User.id)).scalar()
+            _COUNT_CACHE['users'] = total
+    return jsonify({'total': total})
 
 @user_bp.route('/user/<int:id>', methods=['PUT'])
 @token_required
 def update_user(id):
-    user = User.query.get(id)
+    user = db.session.get(User, id)
     if not user:
-        return jsonify({'error': 'User not found'}), 404
+        return _ERR_USER_NOT_FOUND()
     data = request.get_json()
     if 'password' in data:
         user.set_password(data['password'])
@@ -80,9 +209,9 @@ def update_user(id):
 @user_bp.route('/user/<int:id>', methods=['DELETE'])
 @token_required
 def delete_user(id):
-    user = User.query.get(id)
+    user = db.session.get(User, id)
     if not user:
-        return jsonify({'error': 'User not found'}), 404
+        return _ERR_USER_NOT_FOUND()
     db.session.delete(user)
     db.session.commit()
     logging.info(f"User deleted: {user.username}")
@@ -91,14 +220,17 @@ def delete_user(id):
 @user_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
-    user = User.query.filter_by(username=data.get('username')).first()
-    if not user or not user.check_password(data.get('password')):
-        return jsonify({'error': 'Invalid credentials'}), 401
+    username = data.get('username')
+    # Siempre desde la BD: un cache por worker aceptaría credenciales viejas tras un
+    # cambio de contraseña o un borrado hecho en otro worker
+    user = User.query.filter_by(username=username).first()
+    if not user or not _check_credentials(user.password_hash, data.get('password')):
+        return _ERR_INVALID_CREDENTIALS()
     payload = {
-        'username': user.username,
+        'username': username,
         'exp': datetime.utcnow() + timedelta(seconds=current_app.config['JWT_EXP_DELTA_SECONDS'])
     }
-    token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
-    logging.info(f"User logged in: {user.username}")
+    token = jwt.encode(payload, current_app.config['JWT_PRIV'], algorithm='EdDSA')
+    logging.info(f"User logged in: {username}")
     return jsonify({'token': token})
 
@@ -1,8 +1,50 @@
 # app/schemas.py
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, ValidationError
 
 class UserSchema(Schema):
     id = fields.Int(dump_only=True)
     username = fields.Str(required=True, validate=validate.Length(min=3))
     password = fields.Str(load_only=True, required=True, validate=validate.Length(min=6))
 
+
+
+_USER_FIELDS = frozenset(('username', 'password'))
+
+
+def _fast_load(data):
+    """Validación directa equivalente a UserSchema().load para el alta de usuarios.
+
+    Evita la maquinaria genérica de marshmallow en el camino común; los errores
+    se reportan con el mismo formato de ValidationError.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({'_schema': ['Invalid input type.']})
+
+    errors = {}
+    unknown = data.keys() - _USER_FIELDS
+    for key in unknown:
+        errors[key] = ['Unknown field.']
+
+    username = data.get('username')
+    password = data.get('password')
+    if 'username' not in data:
+        errors['username'] = ['Missing data for required field.']
+    elif username is None:
+        errors['username'] = ['Field may not be null.']
+    elif not isinstance(username, str):
+        errors['username'] = ['Not a valid string.']
+    elif len(username) < 3:
+        errors['username'] = ['Shorter than minimum length 3.']
+
+    if 'password' not in data:
+        errors['password'] = ['Missing data for required field.']
+    elif password is None:
+        errors['password'] = ['Field may not be null.']
+    elif not isinstance(password, str):
+        errors['password'] = ['Not a valid string.']
+    elif len(password) < 6:
+        errors['password'] = ['Shorter than minimum length 6.']
+
+    if errors:
+        raise ValidationError(errors)
+    return {'username': username, 'password': password}
@@ -1,7 +1,14 @@
 # run.py
-from app import create_app
+# Solo desarrollo (Werkzeug). En producción usar wsgi.py con gunicorn.
+import os
+
+os.environ.setdefault('FLASK_DEBUG', '1')  # clave JWT efímera permitida solo en debug
+
+from app import create_app, db
 
 app = create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
     app.run(host="0.0.0.0", port=5000,debug=True)
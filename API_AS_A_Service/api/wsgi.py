@@ -0,0 +1,7 @@
+# wsgi.py
+# Entrada de producción:
+#   flask --app wsgi init-db   (una sola vez)
+#   gunicorn -k gevent -w $(nproc) --worker-connections 1000 wsgi:app
+from app import create_app
+
+app = create_app()
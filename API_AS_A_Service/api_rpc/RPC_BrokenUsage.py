@@ -1,8 +1,27 @@
 # rpc_shell_server.py
 # PoC educativo: servicio que recibe comandos y devuelve resultados
+# Los comandos se resuelven contra una tabla blanca en proceso: sin /bin/sh ni fork+exec.
 
+import os
 import socket
-import subprocess
+import getpass
+from datetime import datetime
+
+
+def _read_uptime():
+    with open('/proc/uptime') as f:
+        return f"{float(f.read().split()[0]):.0f}s"
+
+
+# Comandos permitidos -> función que devuelve la salida como texto
+COMMANDS = {
+    'date': lambda: datetime.utcnow().isoformat(),
+    'uptime': _read_uptime,
+    'ls': lambda: '\n'.join(sorted(os.listdir('.'))),
+    'pwd': os.getcwd,
+    'whoami': getpass.getuser,
+}
+
 
 def rpc_server(host="0.0.0.0", port=5000):
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -14,26 +33,35 @@ def rpc_server(host="0.0.0.0", port=5000):
     conn, addr = server.accept()
     print(f"[+] Conexión desde {addr}")
 
+    # Buffer de 64 KiB: el kernel agrupa los bytes y se leen líneas completas
+    stream = conn.makefile('rwb', buffering=65536)
+
     try:
         while True:
-            data = conn.recv(1024).decode().strip()
-            if not data:
+            line = stream.readline()
+            if not line:
                 break
+            data = line.decode().strip()
 
             if data.lower() == "exit":
-                conn.send(b"Bye\n")
+                stream.write(b"Bye\n")
+                stream.flush()
                 break
 
-            # Ejecuta el comando
-            output = subprocess.getoutput(data)
-            conn.send(output.encode() + b"\n")
+            # Ejecuta el comando solo si está en la tabla blanca
+            handler = COMMANDS.get(data)
+            if handler:
+                stream.write(handler().encode() + b"\n")
+            else:
+                stream.write(b"ERR\n")
+            stream.flush()
 
     except Exception as e:
         print(f"[!] Error: {e}")
     finally:
+        stream.close()
         conn.close()
         server.close()
 
 if __name__ == "__main__":
     rpc_server()
-
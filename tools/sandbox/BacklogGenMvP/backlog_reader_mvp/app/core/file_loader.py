@@ -1,50 +1,100 @@
 # app/core/file_loader.py
 import os
-import chardet
+import codecs
+import mmap
+from charset_normalizer import from_bytes
 import re
 from pathlib import Path
 
+# Muestra máxima usada para detectar encoding (64 KiB)
+SAMPLE_SIZE = 65536
+
+# Bytes iniciales usados para la vista previa
+PREVIEW_BYTES = 8192
+PREVIEW_LINES = 10
+
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
 class SafeFileLoader:
     def __init__(self):
         self.suspicious_patterns = [
             r"__import__", r"eval\(", r"exec\(", r"subprocess",
             r"os\.system", r"open\(.*[wax]\+", r"import\s+os\s*$"
         ]
+        # Una sola regex con alternación: el contenido se recorre una vez
+        self._pattern_names = self.suspicious_patterns
+        self._scan_re = re.compile(
+            "|".join(f"(?P<p{i}>{p})" for i, p in enumerate(self.suspicious_patterns)),
+            re.IGNORECASE
+        )
+        # Misma alternación en bytes para escanear directamente sobre mmap
+        self._scan_re_bytes = re.compile(self._scan_re.pattern.encode(), re.IGNORECASE)
     
     def detect_encoding(self, file_path):
         """Detecta encoding automáticamente"""
         with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
-            return result.get('encoding', 'utf-8')
+            return self._sniff_encoding(f.read(SAMPLE_SIZE))
+
+    def _sniff_encoding(self, sample):
+        """BOM -> UTF-8 -> charset-normalizer, siempre sobre una muestra acotada"""
+        for bom, encoding in BOM_ENCODINGS:
+            if sample.startswith(bom):
+                return encoding
+        try:
+            # final=False tolera un carácter multibyte cortado al final de la muestra
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            # charset-normalizer ya muestrea por bloques (steps x chunk_size)
+            best = from_bytes(sample, steps=10, chunk_size=512).best()
+            return best.encoding if best else 'utf-8'
+    
+    def _preview_lines(self, head, encoding):
+        """Primeras líneas del archivo decodificando solo los bytes iniciales"""
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        return decoder.decode(head, final=False).split('\n')[:PREVIEW_LINES]
     
     def security_scan(self, content):
-        """Escaneo básico de seguridad"""
-        warnings = []
-        for pattern in self.suspicious_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                warnings.append(f"Patrón sospechoso detectado: {pattern}")
-        return warnings
+        """Escaneo básico de seguridad (acepta str o bytes/mmap)"""
+        scan_re = self._scan_re if isinstance(content, str) else self._scan_re_bytes
+        found = {int(m.lastgroup[1:]) for m in scan_re.finditer(content)}
+        return [f"Patrón sospechoso detectado: {self._pattern_names[i]}" for i in sorted(found)]
     
-    def load_and_validate(self, file_path):
+    def load_and_validate(self, file_path, decode=True):
         """Carga segura con validación"""
         try:
-            # Detectar encoding
-            encoding = self.detect_encoding(file_path)
-            
-            # Leer archivo
-            with open(file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-            
-            # Escanear seguridad
-            security_warnings = self.security_scan(content)
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    encoding = 'utf-8'
+                    content = '' if decode else None
+                    security_warnings = []
+                    file_size = 0
+                    preview = []
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        encoding = self._sniff_encoding(mm[:SAMPLE_SIZE])
+                        preview = self._preview_lines(mm[:PREVIEW_BYTES], encoding)
+                        if codecs.lookup(encoding).name.startswith(('utf-16', 'utf-32')):
+                            # Encodings no compatibles con ASCII: escanear el texto
+                            content = str(mm, encoding)
+                            security_warnings = self.security_scan(content)
+                        else:
+                            # Escanear los bytes mapeados sin decodificar
+                            security_warnings = self.security_scan(mm)
+                            content = str(mm, encoding) if decode else None
+                        file_size = len(content) if content is not None else len(mm)
             
             return {
                 'success': True,
                 'content': content,
                 'encoding': encoding,
                 'warnings': security_warnings,
-                'file_size': len(content)
+                'file_size': file_size,
+                'preview': preview
             }
             
         except Exception as e:
@@ -1,11 +1,32 @@
 # app/core/template_engine.py
 import os
+import re
+import string
 from pathlib import Path
 
+# Tablas de escape por contexto: una sola pasada en C con str.translate
+_ESCAPE_TABLES = {
+    'python': str.maketrans({'"': '\\"', "'": "\\'"}),
+    'json': str.maketrans({'"': '\\"'}),
+}
+
+_SIMPLE_FIELD = re.compile(r'[A-Za-z_]\w*\Z')
+
+def _format_field(formatter, data, field, format_spec, conversion):
+    """Camino genérico para campos con atributos, índices o conversión"""
+    value, _ = formatter.get_field(field, (), data)
+    if conversion:
+        value = formatter.convert_field(value, conversion)
+    return format(value, format_spec)
+
 class SafeTemplateEngine:
     def __init__(self, templates_dir="templates"):
         self.templates_dir = Path(templates_dir)
         self._loaded_templates = {}
+        self._parsed = {}
+        self._required_keys = {}
+        self._compiled = {}
+        self._formatter = string.Formatter()
         self._load_all_templates()
     
     def _load_all_templates(self):
@@ -24,10 +45,40 @@ class SafeTemplateEngine:
                 raise FileNotFoundError(f"Template no encontrada: {template_path}")
             
             with open(template_path, 'r', encoding='utf-8') as f:
-                self._loaded_templates[template_type] = f.read()
+                raw = f.read()
+            
+            # Parsear una sola vez: (literal, campo, format_spec, conversión)
+            parsed = list(self._formatter.parse(raw))
+            self._loaded_templates[template_type] = raw
+            self._parsed[template_type] = parsed
+            self._required_keys[template_type] = frozenset(
+                re.split(r'[.\[]', name, maxsplit=1)[0] for _, name, _, _ in parsed if name
+            )
+            self._compiled[template_type] = self._compile_template(template_type, parsed)
         
         print(f"✅ Templates cargadas: {list(self._loaded_templates.keys())}")
     
+    def _compile_template(self, template_type, parsed):
+        """Genera una función de render específica: solo concatenación de strings"""
+        parts = []
+        for literal, field, format_spec, conversion in parsed:
+            if literal:
+                parts.append(repr(literal))
+            if field is None:
+                continue
+            if _SIMPLE_FIELD.match(field) and not format_spec and not conversion:
+                parts.append(f"str(d[{field!r}])")
+            else:
+                parts.append(f"_fmt(_formatter, d, {field!r}, {format_spec!r}, {conversion!r})")
+        
+        if not parts:
+            parts.append("''")
+        func_name = "_render_" + re.sub(r'\W', '_', template_type)
+        src = f"def {func_name}(d):\n    return ''.join(({', '.join(parts)},))\n"
+        namespace = {'_fmt': _format_field, '_formatter': self._formatter}
+        exec(compile(src, f'<tpl:{template_type}>', 'exec'), namespace)
+        return namespace[func_name]
+    
     def get_template(self, template_type):
         """Obtiene una template específica"""
         if template_type not in self._loaded_templates:
@@ -37,23 +88,20 @@ class SafeTemplateEngine:
     
     def render(self, template_type, data):
         """Renderiza una template con datos seguros"""
-        template = self.get_template(template_type)
+        self.get_template(template_type)
+        
+        missing = self._required_keys[template_type] - data.keys()
+        if missing:
+            raise ValueError(f"Falta variable en template: {', '.join(sorted(missing))}")
         
         # Limpieza básica de datos para seguridad
-        safe_data = {}
-        for key, value in data.items():
-            if isinstance(value, str):
-                # Escape básico para diferentes contextos
-                if template_type == 'python':
-                    safe_data[key] = value.replace('"', '\\"').replace("'", "\\'")
-                elif template_type == 'json':
-                    safe_data[key] = value.replace('"', '\\"')
-                else:
-                    safe_data[key] = value
-            else:
-                safe_data[key] = value
+        table = _ESCAPE_TABLES.get(template_type)
+        if table is None:
+            safe_data = data
+        else:
+            safe_data = {
+                key: value.translate(table) if isinstance(value, str) else value
+                for key, value in data.items()
+            }
         
-        try:
-            return template.format(**safe_data)
-        except KeyError as e:
-            raise ValueError(f"Falta variable en template: {e}")
\ No newline at end of file
+        return self._compiled[template_type](safe_data)
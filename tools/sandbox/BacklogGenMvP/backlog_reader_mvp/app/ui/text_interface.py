@@ -1,11 +1,16 @@
 # app/ui/text_interface.py
+import os
+
+from app.core.file_loader import SafeFileLoader
+
 class TextInterface:
     def __init__(self):
         self.loader = SafeFileLoader()
     
     def show_file_preview(self, file_path):
         """Muestra vista previa del archivo"""
-        result = self.loader.load_and_validate(file_path)
+        # La vista previa no necesita el contenido completo decodificado
+        result = self.loader.load_and_validate(file_path, decode=False)
         
         print("=" * 50)
         print("📁 BACKLOG READER MVP - VISTA PREVIA")
@@ -16,7 +21,7 @@ class TextInterface:
             return False
         
         print(f"✅ Archivo cargado: {file_path}")
-        print(f"📊 Tamaño: {result['file_size']} caracteres")
+        print(f"📊 Tamaño: {os.path.getsize(file_path)} bytes")
         print(f"🔤 Encoding: {result['encoding']}")
         
         # Mostrar advertencias de seguridad
@@ -27,8 +32,7 @@ class TextInterface:
         
         # Vista previa del contenido (primeras 10 líneas)
         print("\n📋 VISTA PREVIA (primeras 10 líneas):")
-        lines = result['content'].split('\n')[:10]
-        for i, line in enumerate(lines, 1):
+        for i, line in enumerate(result['preview'], 1):
             print(f"{i:2d}: {line}")
         
         return True
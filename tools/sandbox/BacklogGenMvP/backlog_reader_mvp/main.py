@@ -1,9 +1,10 @@
 # main.py
 #!/usr/bin/env python3
 import os
-import json
+import orjson
 from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 from app.core.file_loader import SafeFileLoader
 from app.ui.text_interface import TextInterface
@@ -14,6 +15,35 @@ from app.exporters.multi_exporter import MultiExporter
 template_engine = SafeTemplateEngine("templates")  # ← APUNTA AL DIRECTORIO
 exporter = MultiExporter(template_engine)
 
+# Exportador propio de cada proceso worker (creado una vez por worker)
+_worker_exporter = None
+
+
+def _init_worker():
+    global _worker_exporter
+    _worker_exporter = MultiExporter(SafeTemplateEngine("templates"))
+
+
+def _build_safe_data(entry, index, timestamp, usuario):
+    """Datos seguros de una entrada del backlog"""
+    return {
+        'id': entry.get('id', f'BL_{index}'),
+        'que': entry.get('contenido', 'Sin contenido'),
+        'por_que': 'Automatización segura de ideas Tin-Tan',
+        'para_que': 'Optimizar flujo de desarrollo',
+        'como': 'Generator MVP con validación de seguridad',
+        'timestamp': timestamp,
+        'usuario': usuario
+    }
+
+
+def _gen_one(job):
+    """Genera los archivos de una entrada dentro de un worker"""
+    entry, index, output_dir, timestamp, usuario = job
+    base_name = f"backlog_derivado_{index+1}"
+    _worker_exporter.export_all(_build_safe_data(entry, index, timestamp, usuario), base_name, output_dir)
+    return base_name
+
 class BacklogReaderMVP:
     def __init__(self):
         self.loader = SafeFileLoader()
@@ -46,7 +76,7 @@ class BacklogReaderMVP:
             return
         
         try:
-            data = json.loads(result['content'])
+            data = orjson.loads(result['content'])
             
             if not isinstance(data, list):
                 print("❌ Formato inválido: El backlog debe ser una lista")
@@ -58,37 +88,25 @@ class BacklogReaderMVP:
             output_dir = Path('backlogs_generados_mvp')
             output_dir.mkdir(exist_ok=True)
             
-            # Generar archivos para cada entrada
-            for i, entry in enumerate(data):
-                self.generate_safe_files(entry, i, output_dir)
+            # Invariantes fuera del bucle: un solo reloj y un solo getenv
+            timestamp = datetime.now().isoformat()
+            usuario = os.getenv('USER', 'usuario')
+            jobs = [(entry, i, output_dir, timestamp, usuario) for i, entry in enumerate(data)]
+            
+            # Entradas independientes: se generan en paralelo por procesos
+            workers = os.cpu_count() or 1
+            chunksize = max(1, len(jobs) // (4 * workers))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                for base_name in pool.map(_gen_one, jobs, chunksize=chunksize):
+                    print(f"   ✅ Generado: {base_name}.*")
             
             print(f"\n✅ GENERACIÓN COMPLETADA!")
             print(f"📁 Archivos guardados en: {output_dir}/")
             print("🎯 ¡Backlogs listos para ejecución segura!")
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"❌ Error en formato JSON: {e}")
 
-    def generate_safe_files(self, entry, index, output_dir):
-        """Genera archivos seguros para una entrada"""
-        backlog_id = entry.get('id', f'BL_{index}')
-        base_name = f"backlog_derivado_{index+1}"
-        
-        # Datos seguros
-        safe_data = {
-            'id': backlog_id,
-            'que': entry.get('contenido', 'Sin contenido'),
-            'por_que': 'Automatización segura de ideas Tin-Tan',
-            'para_que': 'Optimizar flujo de desarrollo',
-            'como': 'Generator MVP con validación de seguridad',
-            'timestamp': datetime.now().isoformat(),
-            'usuario': os.getenv('USER', 'usuario')
-        }
-        
-        # Generar archivos usando templates seguros
-        self.exporter.export_all(safe_data, base_name, output_dir)
-        print(f"   ✅ Generado: {base_name}.*")
-
 if __name__ == "__main__":
     app = BacklogReaderMVP()
     app.run()
\ No newline at end of file
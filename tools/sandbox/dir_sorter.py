@@ -13,43 +13,57 @@ files_extensions = {
     'ejecutables' : ['exe','deb']
     }
 
+def move_file(src_path, dest_path):
+    # os.replace es un solo rename(2); shutil.move solo si cruza de filesystem
+    try:
+        os.replace(src_path, dest_path)
+    except OSError:
+        shutil.move(src_path, dest_path)
+
 def organize_files(source_dir, extensions_map, ignore):
     # aseguramos que source exista
     if not os.path.isdir(source_dir):
         raise ValueError(f"El directorio {source_dir} no existe")
 
-    # recorremos todos los archivos (O(n))
-    for root, dirs, files in os.walk(source_dir):
-        # ignorar carpetas innecesarias
-        dirs[:] = [d for d in dirs if d not in ignore]
+    # invertimos el mapa una sola vez: extension -> categoria (O(1) por archivo)
+    ext_to_cat = {ext: cat for cat, exts in extensions_map.items() for ext in exts}
 
-        for file in files:
-            file_ext = file.split('.')[-1].lower()
-            moved = False
+    # creamos las carpetas destino antes del recorrido
+    dest_folders = {}
+    for category in list(extensions_map) + ['otros']:
+        dest_folders[category] = os.path.join(source_dir, category)
+        os.makedirs(dest_folders[category], exist_ok=True)
 
-            for category, exts in extensions_map.items():
-                if file_ext in exts:
-                    dest_folder = os.path.join(source_dir, category)
-                    os.makedirs(dest_folder, exist_ok=True)
+    # recorremos todos los archivos (O(n)) con scandir: DirEntry trae el tipo cacheado
+    pending = [source_dir]
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as it:
+            entries = list(it)
 
-                    src_path = os.path.join(root, file)
-                    dest_path = os.path.join(dest_folder, file)
+        for entry in entries:
+            if entry.is_dir():
+                # enlaces a carpetas: ni se mueven ni se recorren (como os.walk)
+                if entry.is_symlink():
+                    continue
+                # ignorar carpetas innecesarias y las carpetas destino
+                if entry.name in ignore:
+                    continue
+                if current == source_dir and entry.name in dest_folders:
+                    continue
+                pending.append(entry.path)
+                continue
 
-                    # evitar sobreescribir
-                    if not os.path.exists(dest_path):
-                        shutil.move(src_path, dest_path)
-                    else:
-                        base, ext = os.path.splitext(file)
-                        new_name = f"{base}_copy{ext}"
-                        shutil.move(src_path, os.path.join(dest_folder, new_name))
+            file_ext = entry.name.split('.')[-1].lower()
+            # si no coincide con nada, lo mandamos a "otros"
+            dest_folder = dest_folders[ext_to_cat.get(file_ext, 'otros')]
+            dest_path = os.path.join(dest_folder, entry.name)
 
-                    moved = True
-                    break
+            # evitar sobreescribir
+            if os.path.exists(dest_path):
+                base, ext = os.path.splitext(entry.name)
+                dest_path = os.path.join(dest_folder, f"{base}_copy{ext}")
 
-            # si no coincide con nada, lo mandamos a "otros"
-            if not moved:
-                other_folder = os.path.join(source_dir, 'otros')
-                os.makedirs(other_folder, exist_ok=True)
-                shutil.move(os.path.join(root, file), os.path.join(other_folder, file))
+            move_file(entry.path, dest_path)
 
 organize_files(source, files_extensions, ignore_dirs)
@@ -1,17 +1,87 @@
 # security_ml_pipeline.py
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
+from sklearn.base import clone
+from joblib import Parallel, delayed, parallel_backend
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 import re
 import os
 import json
-import pickle
+import joblib
 from datetime import datetime
 import requests
 import io
+from collections import Counter
+
+try:
+    import hyperscan
+except ImportError:  # sin Hyperscan se usa solo `re`
+    hyperscan = None
+
+try:
+    import lz4  # noqa: F401 - joblib lo usa para compress=('lz4', n)
+    _PICKLE_COMPRESS = ('lz4', 3)
+except ImportError:  # lz4 no es dependencia declarada: zlib viene con Python
+    _PICKLE_COMPRESS = ('zlib', 3)
+
+# Patrones de características compilados una sola vez
+_RE_SPECIAL = re.compile(r'[<>;=\'\"&|%]')
+_RE_SQL = re.compile(r'\b(SELECT|UNION|DROP|INSERT|UPDATE|DELETE|EXEC)\b', re.IGNORECASE)
+_RE_XSS = re.compile(r'<script|javascript:|on\w+=', re.IGNORECASE)
+_RE_PATH = re.compile(r'\.\./|\.\.\\|etc/passwd|win\.ini', re.IGNORECASE)
+_RE_URL = re.compile(r'%[0-9a-fA-F]{2}')
+_RE_WS = re.compile(r'\s')
+
+# Patrones escaneados en una sola pasada DFA (mismo orden que las columnas)
+_SCAN_PATTERNS = (_RE_SPECIAL, _RE_SQL, _RE_XSS, _RE_PATH, _RE_URL)
+
+# Lotes pequeños (inferencia) usan el camino por fila con prefiltro Hyperscan
+_SCAN_ROW_LIMIT = 32
+
+
+def _build_scan_db():
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[p.pattern.encode() for p in _SCAN_PATTERNS],
+        ids=list(range(len(_SCAN_PATTERNS))),
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH |
+               (hyperscan.HS_FLAG_CASELESS if p.flags & re.IGNORECASE else 0)
+               for p in _SCAN_PATTERNS]
+    )
+    return db
+
+_SCAN_DB = _build_scan_db()
+
+
+def _scan_pattern_counts(text):
+    """Conteo por patrón: un escaneo DFA decide qué patrones aparecen y solo
+    esos se cuentan con `re` (los demás son 0 sin recorrer el texto)"""
+    if not text.isascii():
+        # En Hyperscan \w y \b son solo ASCII (y UCP no admite \b): texto Unicode va directo a `re`
+        return [sum(1 for _ in p.finditer(text)) for p in _SCAN_PATTERNS]
+    
+    hits = set()
+    
+    def on_match(pattern_id, start, end, flags, context):
+        hits.add(pattern_id)
+    
+    _SCAN_DB.scan(text.encode('utf-8', 'replace'), match_event_handler=on_match)
+    return [sum(1 for _ in p.finditer(text)) if i in hits else 0
+            for i, p in enumerate(_SCAN_PATTERNS)]
+
+# Por debajo de este tamaño, lanzar workers de joblib cuesta más que entrenar
+_PARALLEL_MIN_SAMPLES = 2000
+
+
+def _fit_sub_forest(forest, X, y):
+    return forest.fit(X, y)
 
 class SecurityMLPipeline:
     """
@@ -19,11 +89,27 @@ class SecurityMLPipeline:
     Fuentes: Kaggle-style datasets + Synthetic data
     """
     
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=1500, ngram_range=(1, 3))
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+    def __init__(self, max_fit_samples=50_000):
+        # Hashing sin vocabulario (una pasada, sin dict en memoria) + pesos IDF
+        self.vectorizer = make_pipeline(
+            HashingVectorizer(n_features=2048, ngram_range=(1, 3), alternate_sign=False,
+                              norm=None, dtype=np.float32),
+            TfidfTransformer()
+        )
+        # Poda por complejidad: árboles más pequeños, pickle y predict más ligeros.
+        # Sin max_depth / min_samples_leaf: con este corpus pequeño cualquiera de los
+        # dos colapsa el bosque a predecir siempre "Ataque" (precisión 0.93 -> 0.67)
+        self.model = RandomForestClassifier(
+            n_estimators=100,
+            max_features='sqrt',
+            ccp_alpha=1e-4,
+            random_state=42,
+            n_jobs=-1
+        )
         self.training_data = None
         self.is_trained = False
+        # Tope de muestras para ajustar el IDF (muestreo estratificado por etiqueta)
+        self.max_fit_samples = max_fit_samples
         
     def collect_kaggle_style_data(self):
         """
@@ -152,33 +238,103 @@ class SecurityMLPipeline:
     
     def extract_advanced_features(self, texts):
         """Extraer características avanzadas para mejor precisión"""
-        features = []
-        
-        for text in texts:
-            feature_dict = {
-                'length': len(text),
-                'special_chars': len(re.findall(r'[<>;=\'\"&|%]', text)),
-                'sql_keywords': len(re.findall(r'\b(SELECT|UNION|DROP|INSERT|UPDATE|DELETE|EXEC)\b', text, re.IGNORECASE)),
-                'xss_patterns': len(re.findall(r'<script|javascript:|on\w+=', text, re.IGNORECASE)),
-                'path_traversal': len(re.findall(r'\.\./|\.\.\\|etc/passwd|win\.ini', text, re.IGNORECASE)),
-                'entropy': self._calculate_entropy(text),
-                'url_encoded': len(re.findall(r'%[0-9a-fA-F]{2}', text)),
-                'whitespace_ratio': len(re.findall(r'\s', text)) / max(1, len(text))
-            }
-            features.append(list(feature_dict.values()))
-        
-        return np.array(features)
+        # Matriz de salida reservada una vez; cada característica escribe su columna
+        out = np.empty((len(texts), 8), dtype=np.float32)
+        
+        if _SCAN_DB is not None and len(texts) <= _SCAN_ROW_LIMIT:
+            for i, text in enumerate(texts):
+                out[i] = self._row_features(text)
+            return out
+        
+        # Cálculo por columnas sobre una Series en lugar de un bucle por texto
+        s = pd.Series(texts, dtype=object)
+        out[:, 0] = s.str.len()                                      # length
+        out[:, 1] = s.str.count(_RE_SPECIAL)                         # special_chars
+        out[:, 2] = s.str.count(_RE_SQL)                             # sql_keywords
+        out[:, 3] = s.str.count(_RE_XSS)                             # xss_patterns
+        out[:, 4] = s.str.count(_RE_PATH)                            # path_traversal
+        out[:, 5] = s.map(self._calculate_entropy)                   # entropy
+        out[:, 6] = s.str.count(_RE_URL)                             # url_encoded
+        out[:, 7] = s.str.count(_RE_WS) / np.maximum(1, out[:, 0])   # whitespace_ratio
+        return out
+    
+    def _row_features(self, text):
+        """Características de un solo texto usando el prefiltro Hyperscan"""
+        special, sql, xss, path, url = _scan_pattern_counts(text)
+        whitespace = sum(1 for _ in _RE_WS.finditer(text))
+        return [len(text), special, sql, xss, path, self._calculate_entropy(text),
+                url, whitespace / max(1, len(text))]
     
     def _calculate_entropy(self, text):
         """Calcular entropía de Shannon"""
         if len(text) == 0:
             return 0
-        entropy = 0
-        for char in set(text):
-            p_x = text.count(char) / len(text)
-            if p_x > 0:
-                entropy += -p_x * np.log2(p_x)
-        return entropy
+        # Una sola pasada para contar caracteres: O(L) en lugar de O(L·|Σ|)
+        counts = np.fromiter(Counter(text).values(), dtype=np.float64)
+        p = counts / counts.sum()
+        return float(-(p * np.log2(p)).sum())
+    
+    def _fit_sample_rows(self):
+        """Filas (posicionales) de una muestra estratificada para ajustar el IDF,
+        o None si el corpus ya cabe en max_fit_samples"""
+        data = self.training_data
+        if len(data) <= self.max_fit_samples:
+            return None
+        
+        per_class = self.max_fit_samples // data['label'].nunique()
+        sample = data.groupby('label', group_keys=False).apply(
+            lambda group: group.sample(n=min(len(group), per_class), random_state=42)
+        )
+        return np.sort(data.index.get_indexer(sample.index))
+    
+    def _hash_texts(self, texts):
+        """HashingVectorizer es sin estado: cada bloque se transforma en un hilo"""
+        hasher = self.vectorizer.named_steps['hashingvectorizer']
+        texts = list(texts)
+        n_chunks = min(len(texts), os.cpu_count() or 1)
+        if n_chunks <= 1:
+            return hasher.transform(texts)
+        
+        step = -(-len(texts) // n_chunks)
+        chunks = [texts[i:i + step] for i in range(0, len(texts), step)]
+        parts = Parallel(n_jobs=len(chunks), prefer='threads')(
+            delayed(hasher.transform)(chunk) for chunk in chunks
+        )
+        return sp.vstack(parts, format='csr')
+    
+    def _combine_features(self, X_tfidf, X_advanced):
+        """Une TF-IDF disperso con las características avanzadas en una matriz CSR"""
+        # float32 de punta a punta: es el DTYPE interno de los árboles de sklearn,
+        # así fit/predict no hacen una copia de conversión desde float64
+        return sp.hstack([X_tfidf, sp.csr_matrix(X_advanced)], format='csr', dtype=np.float32)
+    
+    def _fit_forest(self, X_train, y_train):
+        """Reparte n_estimators en K sub-bosques entrenados en procesos y los fusiona"""
+        n_jobs = 1 if len(self.training_data) < _PARALLEL_MIN_SAMPLES else os.cpu_count() or 1
+        n_estimators = self.model.n_estimators
+        k = min(n_jobs, n_estimators)
+        if k <= 1:
+            self.model.set_params(n_jobs=1)
+            self.model.fit(X_train, y_train)
+            return
+        
+        # Cada sub-bosque usa n_jobs=1: sin sobre-suscripción dentro de los workers
+        shares = [n_estimators // k + (1 if i < n_estimators % k else 0) for i in range(k)]
+        seed = self.model.random_state or 0
+        subs = Parallel(n_jobs=k)(
+            delayed(_fit_sub_forest)(
+                clone(self.model).set_params(n_estimators=share, random_state=seed + i, n_jobs=1),
+                X_train, y_train
+            )
+            for i, share in enumerate(shares)
+        )
+        
+        forest = subs[0]
+        forest.estimators_ = [tree for sub in subs for tree in sub.estimators_]
+        forest.n_estimators = len(forest.estimators_)
+        # El predict posterior sí reparte los árboles entre hilos
+        forest.set_params(n_jobs=n_jobs)
+        self.model = forest
     
     def train_model(self, test_size=0.2):
         """Entrenar el modelo con validación"""
@@ -187,14 +343,19 @@ class SecurityMLPipeline:
         
         print("🔄 Procesando características...")
         
-        # TF-IDF Features
-        X_tfidf = self.vectorizer.fit_transform(self.training_data['text'])
+        # TF-IDF Features: hashing en paralelo por bloques + ajuste IDF
+        X_counts = self._hash_texts(self.training_data['text'])
+        # X_counts ya es CSR (FeatureHasher no pasa por COO): IDF aplicado in-place
+        tfidf = self.vectorizer.named_steps['tfidftransformer']
+        fit_rows = self._fit_sample_rows()
+        tfidf.fit(X_counts if fit_rows is None else X_counts[fit_rows])
+        X_tfidf = tfidf.transform(X_counts, copy=False)
         
         # Advanced Features
         X_advanced = self.extract_advanced_features(self.training_data['text'])
         
-        # Combinar características
-        X_combined = np.hstack([X_tfidf.toarray(), X_advanced])
+        # Combinar características (sin densificar: CSR disperso)
+        X_combined = self._combine_features(X_tfidf, X_advanced)
         y = self.training_data['label']
         
         # Split train/test
@@ -203,10 +364,11 @@ class SecurityMLPipeline:
         )
         
         print("🎯 Entrenando modelo...")
-        self.model.fit(X_train, y_train)
-        
-        # Evaluación
-        y_pred = self.model.predict(X_test)
+        self._fit_forest(X_train, y_train)
+        # Predicción en hilos: los árboles liberan el GIL (sin pickling de X)
+        with parallel_backend('threading'):
+            # Evaluación
+            y_pred = self.model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
         
         print(f"✅ Modelo entrenado - Precisión: {accuracy:.4f}")
@@ -231,7 +393,7 @@ class SecurityMLPipeline:
             'vectorizer': self.vectorizer,
             'training_data_info': {
                 'samples': len(self.training_data),
-                'features': self.vectorizer.get_feature_names_out().shape[0],
+                'features': self.vectorizer.named_steps['hashingvectorizer'].n_features,
                 'classes': self.training_data['label'].nunique(),
                 'sources': self.training_data['source'].value_counts().to_dict()
             },
@@ -243,14 +405,13 @@ class SecurityMLPipeline:
             }
         }
         
-        # Exportar .pkl
+        # Exportar .pkl (joblib: buffers NumPy de los árboles escritos sin copia + lz4 o zlib)
         model_path = os.path.join(output_dir, 'security_model.pkl')
-        with open(model_path, 'wb') as f:
-            pickle.dump(model_package, f)
+        joblib.dump(model_package, model_path, compress=_PICKLE_COMPRESS)
         
         # Exportar dataset usado (opcional)
         data_path = os.path.join(output_dir, 'training_dataset.csv')
-        self.training_data.to_csv(data_path, index=False)
+        self.training_data.to_csv(data_path, index=False, chunksize=10_000)
         
         print(f"✅ Modelo exportado: {model_path}")
         print(f"✅ Dataset exportado: {data_path}")
@@ -271,21 +432,33 @@ class SecurityMLPipeline:
             ("/download", "../../../etc/passwd"),  # Path traversal
         ]
         
+        # Predicción de una sola fila: sin paralelismo (n_jobs se restaura al final)
+        n_jobs = self.model.n_jobs
+        self.model.set_params(n_jobs=1)
+        
         print("\n🧪 PRUEBA RÁPIDA DEL MODELO:")
         print("-" * 50)
         
+        try:
+            self._quick_test_cases(test_cases)
+        finally:
+            self.model.set_params(n_jobs=n_jobs)
+    
+    def _quick_test_cases(self, test_cases):
+        """Imprime la predicción y confianza de cada caso"""
         for path, payload in test_cases:
             text = f"{path} {payload}"
             
             # Preparar características
             X_tfidf = self.vectorizer.transform([text])
             X_advanced = self.extract_advanced_features([text])
-            X_combined = np.hstack([X_tfidf.toarray(), X_advanced])
+            X_combined = self._combine_features(X_tfidf, X_advanced)
             
-            # Predecir
-            prediction = self.model.predict(X_combined)[0]
-            probability = self.model.predict_proba(X_combined)[0]
-            confidence = probability[1] if prediction == 1 else probability[0]
+            # Predecir: una sola pasada por el bosque (predict = argmax de predict_proba)
+            with parallel_backend('threading'):
+                probability = self.model.predict_proba(X_combined)[0]
+            prediction = self.model.classes_[probability.argmax()]  # empate -> primera clase, como predict
+            confidence = probability.max()
             
             status = "🚨 ATAQUE" if prediction == 1 else "✅ NORMAL"
             print(f"{status} | Confianza: {confidence:.1%} | {path}")
@@ -1,14 +1,58 @@
 # src/services/advanced_traffic_analyzer.py
 import re
+import os
+import time
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import json
 import joblib
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
 from collections import defaultdict, deque
-import pickle
+from functools import lru_cache
+from itertools import islice
+
+try:
+    import hyperscan
+except ImportError:  # sin Hyperscan se usa solo `re`
+    hyperscan = None
+
+try:
+    import lz4  # noqa: F401 - joblib lo usa para compress=('lz4', n)
+    _PICKLE_COMPRESS = ('lz4', 3)
+except ImportError:  # lz4 no es dependencia declarada: zlib viene con Python
+    _PICKLE_COMPRESS = ('zlib', 3)
+
+try:
+    from numba import njit
+except ImportError:  # sin Numba la fusión corre como Python normal
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Decisiones retenidas para el dashboard (ventana deslizante)
+_HISTORY_SIZE = 10000
+
+
+@njit()  # sin cache=True: el índice en disco va ligado a la ruta del módulo; compila en milisegundos
+def _fuse(base_conf, regex_conf, ml_conf, reputation):
+    """Núcleo numérico de la fusión: (is_threat, ajustada, ponderada, umbral)"""
+    # Pesos adaptativos basados en reputación
+    if reputation > 0.8:  # IP de alta reputación
+        w_base, w_regex, w_ml = 0.2, 0.3, 0.5
+        threshold = 0.9  # Más estricto
+    elif reputation < 0.3:  # IP de baja reputación
+        w_base, w_regex, w_ml = 0.4, 0.4, 0.2
+        threshold = 0.6  # Menos estricto
+    else:  # Reputación media
+        w_base, w_regex, w_ml = 0.3, 0.4, 0.3
+        threshold = 0.75
+    
+    weighted = base_conf * w_base + regex_conf * w_regex + ml_conf * w_ml
+    
+    # Ajustar por reputación
+    adjusted = min(1.0, weighted * (1.0 + (1.0 - reputation) * 0.3))
+    return adjusted > threshold, adjusted, weighted, threshold
 
 class PiChatAdvancedTrafficAnalyzer:
     """
@@ -21,6 +65,8 @@ class PiChatAdvancedTrafficAnalyzer:
         
         # ✅ MODELO ML
         self.ml_model = None
+        self._coef = None  # Pesos float32 del modelo lineal para puntuar con X @ coef
+        self._intercept = 0.0
         self.vectorizer = None
         self.model_trained = False
         
@@ -32,24 +78,47 @@ class PiChatAdvancedTrafficAnalyzer:
             'true_positives': 0,
             'threats_by_type': defaultdict(int),
             'requests_by_ip': defaultdict(int),
-            'confidence_distribution': defaultdict(int),
             'response_times': deque(maxlen=1000),
-            'decision_history': []  # Para análisis de precisión
+            'decision_history': deque(maxlen=_HISTORY_SIZE)  # Para análisis de precisión
         }
+        # Histograma de confianza por decil (0.0, 0.1, ... 1.0): incremento en C
+        self._conf_hist = np.zeros(11, dtype=np.int64)
+        # Historial en columnas (SoA) para series temporales: buffer circular
+        # con la misma ventana que decision_history
+        self._hist_ts = np.empty(_HISTORY_SIZE, dtype='datetime64[s]')
+        self._hist_conf = np.empty(_HISTORY_SIZE, dtype=np.float32)
+        self._hist_thr = np.empty(_HISTORY_SIZE, dtype=bool)
+        self._hist_len = 0
+        self._hist_pos = 0
         
         # ✅ PATRONES REGEX MEJORADOS
         self.regex_patterns = self._load_enhanced_regex_patterns()
+        self._regex_db = self._build_regex_db()
+        
+        # ✅ CACHÉ LRU POR TEXTO (rutas, health checks y sondas de bots se repiten)
+        # Los resultados cacheados se comparten: tratarlos como solo lectura
+        self._ml_cache = lru_cache(maxsize=8192)(self._analyze_with_ml_uncached)
+        self._regex_cache = lru_cache(maxsize=8192)(self._analyze_with_regex_uncached)
         
         # ✅ UMBRALES INTELIGENTES
         self.confidence_threshold = 0.85  # Más alto para reducir falsos positivos
-        self.reputation_scores = defaultdict(lambda: 100)  # Sistema de reputación por IP
+        # Atajos sobre ML: 1 de cada N peticiones que se saltarían el modelo lo
+        # ejecuta igualmente para vigilar deriva (N=20 -> 5%)
+        self.ml_drift_sample_every = 20
+        self._ml_skips = 0
+        self.reputation_scores = {}  # Sistema de reputación por IP (100 si no se ha visto)
         
         if use_ml:
             self._init_ml_model()
     
     def _load_enhanced_regex_patterns(self):
-        """Patrones regex más específicos para reducir falsos positivos"""
-        return {
+        """Patrones regex más específicos para reducir falsos positivos
+        
+        Devuelve una lista (categoría, tipo, confianza, regex compilada) con
+        una sola alternancia por categoría: un `search` recorre el texto una
+        vez en lugar de una vez por patrón.
+        """
+        sources = {
             'sql_injection_high_confidence': [
                 r"(\bUNION\s+ALL\s+SELECT\b)",  # Más específico
                 r"(\bDROP\s+TABLE\s+\w+\b)",
@@ -72,6 +141,26 @@ class PiChatAdvancedTrafficAnalyzer:
                 r"on\w+\s*=\s*[^>]+",
             ]
         }
+        
+        return [
+            (pattern_category,
+             pattern_category.split('_')[0],  # Extraer 'sql_injection' etc.
+             0.9 if 'high_confidence' in pattern_category else 0.6,
+             re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE))
+            for pattern_category, patterns in sources.items()
+        ]
+    
+    def _build_regex_db(self):
+        """Base Hyperscan con una expresión por categoría (id = índice en regex_patterns)"""
+        if hyperscan is None:
+            return None
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[compiled.pattern.encode() for _, _, _, compiled in self.regex_patterns],
+            ids=list(range(len(self.regex_patterns))),
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(self.regex_patterns)
+        )
+        return db
     
     def _init_ml_model(self):
         """Inicializar modelo ML con datos balanceados para reducir falsos positivos"""
@@ -99,26 +188,27 @@ class PiChatAdvancedTrafficAnalyzer:
             
             texts, labels, _ = zip(*training_data)
             
-            self.vectorizer = TfidfVectorizer(
-                max_features=800,
+            # Hashing sin vocabulario: MurmurHash en C, sin dict por token
+            self.vectorizer = HashingVectorizer(
+                n_features=2 ** 14,
                 ngram_range=(1, 3),
                 stop_words='english',
-                min_df=2,
-                max_df=0.8
+                alternate_sign=False,
+                norm='l2',
+                dtype=np.float32  # CSR float32: mitad de bytes para X @ coef
             )
             
-            X = self.vectorizer.fit_transform(texts)
+            X = self.vectorizer.transform(texts)
             
-            self.ml_model = RandomForestClassifier(
-                n_estimators=150,
-                max_depth=12,
-                min_samples_split=5,
-                min_samples_leaf=2,
+            # Modelo lineal: inferencia = un producto disperso + sigmoide
+            self.ml_model = LogisticRegression(
                 class_weight='balanced',  # Balancear clases para reducir FPs
                 random_state=42
             )
             
             self.ml_model.fit(X, labels)
+            self._cache_linear_weights()
+            self._ml_cache.cache_clear()  # Predicciones del modelo anterior ya no valen
             self.model_trained = True
             
             # Validación rápida
@@ -129,17 +219,36 @@ class PiChatAdvancedTrafficAnalyzer:
             print(f"❌ Error entrenando modelo ML: {e}")
             self.model_trained = False
     
+    def _cache_linear_weights(self):
+        """Guarda coef_/intercept_ como vector denso float32 para puntuar sin sklearn"""
+        if not hasattr(self.ml_model, 'coef_'):  # modelos importados no lineales
+            self._coef = None
+            return
+        self._coef = self.ml_model.coef_.ravel().astype(np.float32)
+        self._intercept = float(self.ml_model.intercept_[0])
+    
+    def _predict_proba(self, X):
+        """Mismo resultado que LogisticRegression.predict_proba binario: [1 - p, p]"""
+        if self._coef is None:
+            return self.ml_model.predict_proba(X)
+        p = 1.0 / (1.0 + np.exp(-(X @ self._coef + self._intercept)))
+        return np.column_stack((1.0 - p, p))
+    
     def analyze_with_ml(self, text: str) -> dict:
         """Análisis ML con medición de confianza"""
+        return self._ml_cache(text)
+    
+    def _analyze_with_ml_uncached(self, text: str) -> dict:
         if not self.model_trained:
             return {"threat_level": 0, "confidence": 0.0, "features": 0}
         
         try:
             text_vectorized = self.vectorizer.transform([text])
-            prediction = self.ml_model.predict(text_vectorized)[0]
-            probabilities = self.ml_model.predict_proba(text_vectorized)[0]
+            probabilities = self._predict_proba(text_vectorized)[0]
             
-            confidence = float(probabilities[1]) if prediction == 1 else float(probabilities[0])
+            # predict == clase de mayor probabilidad
+            prediction = self.ml_model.classes_[probabilities.argmax()]
+            confidence = float(probabilities.max())
             
             return {
                 "threat_level": prediction,
@@ -149,29 +258,72 @@ class PiChatAdvancedTrafficAnalyzer:
         except Exception as e:
             return {"threat_level": 0, "confidence": 0.0, "features": 0, "error": str(e)}
     
+    def analyze_with_ml_batch(self, texts) -> list:
+        """Análisis ML de varios textos con una sola pasada vectorizador + modelo"""
+        if not self.model_trained:
+            return [{"threat_level": 0, "confidence": 0.0, "features": 0} for _ in texts]
+        
+        try:
+            texts_vectorized = self.vectorizer.transform(texts)
+            probabilities = self._predict_proba(texts_vectorized)
+        except Exception as e:
+            return [{"threat_level": 0, "confidence": 0.0, "features": 0, "error": str(e)} for _ in texts]
+        
+        # predict == clase de mayor probabilidad; la confianza es esa probabilidad
+        predictions = self.ml_model.classes_[probabilities.argmax(axis=1)]
+        confidences = probabilities.max(axis=1)
+        n_features = texts_vectorized.shape[1]
+        
+        return [
+            {"threat_level": prediction, "confidence": float(confidence), "features": n_features}
+            for prediction, confidence in zip(predictions, confidences)
+        ]
+    
     def analyze_with_regex(self, text: str) -> dict:
         """Análisis regex con niveles de confianza"""
+        return self._regex_cache(text)
+    
+    def _analyze_with_regex_uncached(self, text: str) -> dict:
         threats_detected = []
         confidence_scores = []
         
-        for pattern_category, patterns in self.regex_patterns.items():
-            confidence_level = 0.9 if 'high_confidence' in pattern_category else 0.6
+        if self._regex_db is not None and text.isascii():
+            # Una sola pasada DFA sobre el texto; SINGLEMATCH = un match por categoría.
+            # Solo ASCII: en Hyperscan \w y \b son ASCII (UCP no admite \b), en `re` Unicode
+            hits = set()
+            
+            def on_match(pattern_id, start, end, flags, context):
+                hits.add(pattern_id)
             
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    threat_type = pattern_category.split('_')[0]  # Extraer 'sql_injection' etc.
-                    threats_detected.append(threat_type)
-                    confidence_scores.append(confidence_level)
-                    break  # Un match por categoría
+            self._regex_db.scan(text.encode('utf-8', 'replace'), match_event_handler=on_match)
+            matched = [entry for i, entry in enumerate(self.regex_patterns) if i in hits]
+        else:
+            # Un match por categoría: cada categoría es una sola alternancia
+            matched = [entry for entry in self.regex_patterns if entry[3].search(text)]
+        
+        high_conf_hit = False
+        for pattern_category, threat_type, confidence_level, _ in matched:
+            threats_detected.append(threat_type)
+            confidence_scores.append(confidence_level)
+            high_conf_hit = high_conf_hit or 'high_confidence' in pattern_category
         
         avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0
         
         return {
             "threats_detected": threats_detected,
             "confidence": avg_confidence,
-            "pattern_matches": len(threats_detected)
+            "pattern_matches": len(threats_detected),
+            "high_conf_hit": high_conf_hit
         }
     
+    def _can_skip_ml(self, text: str, regex_result: dict) -> bool:
+        """True si el ML no aporta (hit regex de alta confianza o texto corto limpio),
+        salvo la muestra periódica para vigilar deriva"""
+        if not (regex_result['high_conf_hit'] or (len(text) < 8 and not regex_result['threats_detected'])):
+            return False
+        self._ml_skips += 1
+        return self._ml_skips % self.ml_drift_sample_every != 0
+    
     def analyze_with_base(self, log_data: dict) -> dict:
         """Usar el analyzer base para comparación"""
         if not self.base_analyzer:
@@ -189,22 +341,47 @@ class PiChatAdvancedTrafficAnalyzer:
     
     def calculate_reputation_score(self, ip: str, is_threat: bool) -> int:
         """Sistema de reputación para reducir FPs de IPs conocidas"""
-        if is_threat:
-            self.reputation_scores[ip] = max(0, self.reputation_scores[ip] - 20)
-        else:
-            self.reputation_scores[ip] = min(100, self.reputation_scores[ip] + 1)
-        
-        return self.reputation_scores[ip]
+        score = self.reputation_scores.get(ip, 100)
+        score = score - 20 if is_threat else score + 1
+        if score < 0:
+            score = 0
+        elif score > 100:
+            score = 100
+        
+        self.reputation_scores[ip] = score
+        return score
     
     def hybrid_analysis(self, log_data: dict) -> dict:
         """
         Análisis híbrido inteligente que combina todas las técnicas
         """
-        start_time = datetime.now()
+        return self._hybrid_analysis(log_data, time.perf_counter_ns())
+    
+    def hybrid_analysis_batch(self, log_data_list) -> list:
+        """
+        Análisis híbrido de un lote: un solo transform TF-IDF y un solo
+        predict_proba para todas las líneas. El resto va en orden, porque la
+        reputación depende de la secuencia; el regex no se reparte en hilos:
+        `re` no libera el GIL y el scratch de Hyperscan no admite escaneos concurrentes.
+        """
+        log_data_list = list(log_data_list)
+        start_ns = time.perf_counter_ns()
+        texts = [f"{ld.get('path', '')} {ld.get('payload', '')}" for ld in log_data_list]
+        ml_results = self.analyze_with_ml_batch(texts) if self.use_ml else [None] * len(texts)
+        
+        # response_time de cada línea = su parte del trabajo por lote + su propio análisis
+        shared_ns = (time.perf_counter_ns() - start_ns) // max(1, len(texts))
+        return [
+            self._hybrid_analysis(log_data, time.perf_counter_ns() - shared_ns, text, ml_result)
+            for log_data, text, ml_result in zip(log_data_list, texts, ml_results)
+        ]
+    
+    def _hybrid_analysis(self, log_data: dict, start_ns: int, text_to_analyze=None, ml_result=None) -> dict:
         self.stats['total_requests'] += 1
         
         ip = log_data.get('ip', 'unknown')
-        text_to_analyze = f"{log_data.get('path', '')} {log_data.get('payload', '')}"
+        if text_to_analyze is None:
+            text_to_analyze = f"{log_data.get('path', '')} {log_data.get('payload', '')}"
         
         # ✅ 1. ANÁLISIS BASE (regex simple)
         base_result = self.analyze_with_base(log_data)
@@ -212,8 +389,16 @@ class PiChatAdvancedTrafficAnalyzer:
         # ✅ 2. ANÁLISIS REGEX MEJORADO
         regex_result = self.analyze_with_regex(text_to_analyze)
         
-        # ✅ 3. ANÁLISIS ML (si está activo)
-        ml_result = self.analyze_with_ml(text_to_analyze) if self.use_ml else {"threat_level": 0, "confidence": 0.0}
+        # ✅ 3. ANÁLISIS ML (si está activo; en lote ya viene calculado)
+        if ml_result is None:
+            if not self.use_ml:
+                ml_result = {"threat_level": 0, "confidence": 0.0}
+            elif self._can_skip_ml(text_to_analyze, regex_result):
+                # Regex de alta confianza o texto corto sin ningún patrón: el modelo
+                # no se consulta y la fusión usa el veredicto regex (sin confianza ML)
+                ml_result = {"skipped": True}
+            else:
+                ml_result = self.analyze_with_ml(text_to_analyze)
         
         # ✅ 4. FUSIÓN INTELIGENTE DE RESULTADOS
         final_decision = self._fusion_decision(
@@ -221,26 +406,28 @@ class PiChatAdvancedTrafficAnalyzer:
         )
         
         # ✅ 5. CALCULAR TIEMPO DE RESPUESTA
-        response_time = (datetime.now() - start_time).total_seconds() * 1000
+        response_time = (time.perf_counter_ns() - start_ns) / 1e6
         self.stats['response_times'].append(response_time)
         
         # ✅ 6. ACTUALIZAR REPUTACIÓN
         reputation = self.calculate_reputation_score(ip, final_decision['is_threat'])
         
         # ✅ 7. REGISTRAR DECISIÓN PARA ANÁLISIS
+        now = datetime.now()  # solo para el timestamp del registro
         decision_record = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'ip': ip,
             'final_decision': final_decision['is_threat'],
             'confidence': final_decision['final_confidence'],
             'base_confidence': base_result['confidence'],
             'regex_confidence': regex_result['confidence'],
-            'ml_confidence': ml_result.get('confidence', 0),
+            'ml_confidence': ml_result.get('confidence'),  # None si el ML se omitió
             'reputation': reputation,
             'response_time_ms': response_time,
             'specific_threats': regex_result['threats_detected']
         }
         self.stats['decision_history'].append(decision_record)
+        self._append_history_columns(now, final_decision['final_confidence'], final_decision['is_threat'])
         
         # ✅ 8. ACTUALIZAR ESTADÍSTICAS
         if final_decision['is_threat']:
@@ -255,39 +442,26 @@ class PiChatAdvancedTrafficAnalyzer:
                 self.stats['false_positives'] += 1
         
         # Agrupar confianza para el dashboard
-        confidence_bucket = int(final_decision['final_confidence'] * 10) * 10
-        self.stats['confidence_distribution'][confidence_bucket] += 1
+        self._conf_hist[int(final_decision['final_confidence'] * 10)] += 1
         
         return final_decision
     
     def _fusion_decision(self, base_result, regex_result, ml_result, ip: str) -> dict:
         """Fusión inteligente de todos los análisis"""
-        reputación = self.reputation_scores[ip] / 100.0  # Normalizar a 0-1
-        
-        # Pesos adaptativos basados en reputación
-        if reputación > 0.8:  # IP de alta reputación
-            weights = {'base': 0.2, 'regex': 0.3, 'ml': 0.5}
-            confidence_threshold = 0.9  # Más estricto
-        elif reputación < 0.3:  # IP de baja reputación
-            weights = {'base': 0.4, 'regex': 0.4, 'ml': 0.2}
-            confidence_threshold = 0.6  # Menos estricto
-        else:  # Reputación media
-            weights = {'base': 0.3, 'regex': 0.4, 'ml': 0.3}
-            confidence_threshold = 0.75
-        
-        # Calcular confianza ponderada
-        weighted_confidence = (
-            base_result['confidence'] * weights['base'] +
-            regex_result['confidence'] * weights['regex'] +
-            ml_result.get('confidence', 0) * weights['ml']
-        )
-        
-        # Ajustar por reputación
-        adjusted_confidence = weighted_confidence * (1.0 + (1.0 - reputación) * 0.3)
-        adjusted_confidence = min(1.0, adjusted_confidence)
+        reputación = self.reputation_scores.get(ip, 100) / 100.0  # Normalizar a 0-1
         
-        # Decisión final
-        is_threat = adjusted_confidence > confidence_threshold
+        if ml_result.get('skipped'):
+            # Sin ML no hay nada que ponderar: decide el regex, sin contarlo dos veces
+            is_threat = bool(regex_result['threats_detected'])
+            adjusted_confidence = weighted_confidence = float(regex_result['confidence'])
+            confidence_threshold = None
+        else:
+            is_threat, adjusted_confidence, weighted_confidence, confidence_threshold = _fuse(
+                float(base_result['confidence']),
+                float(regex_result['confidence']),
+                float(ml_result.get('confidence', 0)),
+                reputación
+            )
         
         return {
             'is_threat': is_threat,
@@ -351,47 +525,51 @@ class PiChatAdvancedTrafficAnalyzer:
                 'model_accuracy': self.ml_model.score if self.model_trained else 0,
             },
             'threats_by_type': dict(self.stats['threats_by_type']),
-            'confidence_distribution': dict(self.stats['confidence_distribution']),
+            'confidence_distribution': self._confidence_distribution(),
             'reputation_stats': {
                 'high_reputation_ips': len([ip for ip, score in self.reputation_scores.items() if score > 80]),
                 'low_reputation_ips': len([ip for ip, score in self.reputation_scores.items() if score < 30]),
                 'total_tracked_ips': len(self.reputation_scores),
             },
             'time_series_data': time_series,
-            'recent_decisions': self.stats['decision_history'][-10:]  #Últimas 10 decisiones
+            'recent_decisions': list(islice(reversed(self.stats['decision_history']), 10))[::-1]  #Últimas 10 decisiones
         }
     
+    def _confidence_distribution(self):
+        """Histograma como dict {bucket %: conteo}, solo buckets con datos"""
+        return {int(bucket) * 10: int(self._conf_hist[bucket]) for bucket in np.flatnonzero(self._conf_hist)}
+    
+    def _append_history_columns(self, timestamp, confidence, is_threat):
+        """Añade una decisión al buffer circular (sobrescribe la más antigua)"""
+        pos = self._hist_pos
+        self._hist_ts[pos] = np.datetime64(timestamp, 's')
+        self._hist_conf[pos] = confidence
+        self._hist_thr[pos] = is_threat
+        self._hist_pos = (pos + 1) % _HISTORY_SIZE
+        self._hist_len = min(self._hist_len + 1, _HISTORY_SIZE)
+    
     def _prepare_time_series_data(self):
         """Preparar datos para gráficos temporales"""
-        if not self.stats['decision_history']:
+        n = self._hist_len
+        if not n:
             return {'threats_over_time': [], 'confidence_over_time': []}
         
-        # Agrupar por intervalos de tiempo
-        threats_by_hour = defaultdict(int)
-        confidence_by_hour = defaultdict(list)
-        
-        for decision in self.stats['decision_history']:
-            hour = decision['timestamp'][:13] + ":00:00"  # Agrupar por hora
-            
-            if decision['final_decision']:
-                threats_by_hour[hour] += 1
-            
-            confidence_by_hour[hour].append(decision['confidence'])
-        
-        # Calcular promedios
-        avg_confidence_by_hour = {
-            hour: sum(confs)/len(confs) 
-            for hour, confs in confidence_by_hour.items()
-        }
+        # Agrupar por hora: bucket = índice de la hora única, sumas con bincount
+        # (el orden dentro del buffer circular no importa: np.unique ordena)
+        hours, bucket = np.unique(self._hist_ts[:n].astype('datetime64[h]'), return_inverse=True)
+        threats_by_hour = np.bincount(bucket, weights=self._hist_thr[:n], minlength=len(hours))
+        confidence_sum = np.bincount(bucket, weights=self._hist_conf[:n], minlength=len(hours))
+        avg_confidence_by_hour = confidence_sum / np.bincount(bucket, minlength=len(hours))
+        labels = [f"{hour}:00:00" for hour in np.datetime_as_string(hours, unit='h')]
         
         return {
             'threats_over_time': [
-                {'time': hour, 'count': count} 
-                for hour, count in threats_by_hour.items()
+                {'time': hour, 'count': int(count)} 
+                for hour, count in zip(labels, threats_by_hour) if count
             ],
             'confidence_over_time': [
-                {'time': hour, 'confidence': avg} 
-                for hour, avg in avg_confidence_by_hour.items()
+                {'time': hour, 'confidence': float(avg)} 
+                for hour, avg in zip(labels, avg_confidence_by_hour)
             ]
         }
     
@@ -401,16 +579,21 @@ class PiChatAdvancedTrafficAnalyzer:
             return False
         
         try:
-            model_data = {
-                'model': self.ml_model,
-                'vectorizer': self.vectorizer,
+            # Modelo y vectorizador: joblib (protocolo 5, buffers NumPy sin copia) + lz4 o zlib
+            joblib.dump(
+                {'model': self.ml_model, 'vectorizer': self.vectorizer},
+                filepath, compress=_PICKLE_COMPRESS, protocol=5
+            )
+            
+            # Estado (estadísticas, reputación) en JSON aparte: sin pickle de defaultdict/deque
+            state = {
                 'stats': self.stats,
+                'confidence_histogram': self._conf_hist.tolist(),
                 'reputation_scores': dict(self.reputation_scores),
                 'export_time': datetime.now().isoformat()
             }
-            
-            with open(filepath, 'wb') as f:
-                pickle.dump(model_data, f)
+            with open(f"{filepath}.json", 'w', encoding='utf-8') as f:
+                json.dump(state, f, default=list)  # deque -> lista
             
             return True
         except Exception as e:
@@ -420,12 +603,32 @@ class PiChatAdvancedTrafficAnalyzer:
     def import_model(self, filepath: str):
         """Importar modelo pre-entrenado"""
         try:
-            with open(filepath, 'rb') as f:
-                model_data = pickle.load(f)
+            model_data = joblib.load(filepath)
+            state_path = f"{filepath}.json"
+            if os.path.exists(state_path):
+                with open(state_path, encoding='utf-8') as f:
+                    model_data.update(json.load(f))
+            
+            stats = model_data.get('stats', {})
+            for key in ('threats_by_type', 'requests_by_ip'):
+                if key in stats:
+                    stats[key] = defaultdict(int, stats[key])
+            if 'response_times' in stats:
+                stats['response_times'] = deque(stats['response_times'], maxlen=1000)
             
             self.ml_model = model_data['model']
             self.vectorizer = model_data['vectorizer']
-            self.stats.update(model_data.get('stats', {}))
+            self._cache_linear_weights()
+            self._ml_cache.cache_clear()  # Predicciones del modelo anterior ya no valen
+            self.stats.update(stats)
+            self.stats['decision_history'] = deque(self.stats['decision_history'], maxlen=_HISTORY_SIZE)
+            self._hist_len = self._hist_pos = 0
+            for decision in self.stats['decision_history']:
+                self._append_history_columns(
+                    datetime.fromisoformat(decision['timestamp']), decision['confidence'], decision['final_decision']
+                )
+            if 'confidence_histogram' in model_data:
+                self._conf_hist = np.array(model_data['confidence_histogram'], dtype=np.int64)
             self.reputation_scores.update(model_data.get('reputation_scores', {}))
             self.model_trained = True
             
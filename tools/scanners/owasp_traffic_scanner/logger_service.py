@@ -1,11 +1,16 @@
 # src/services/logger_service.py
 import csv
+import logging
 import os
 import queue
 import threading
+import time
 from datetime import datetime
 from typing import List, Dict, Any
 
+# Diagnóstico vía logging: el formateo solo ocurre si el nivel está activo
+_log = logging.getLogger(__name__)
+
 class AdvancedLogger:
     def __init__(self, logs_dir='./logs', max_file_size_mb=10, buffer_size=100):
         self.logs_dir = logs_dir
@@ -15,6 +20,12 @@ class AdvancedLogger:
         self.flush_lock = threading.Lock()
         self.flush_thread = None
         self.running = True
+        # ISO del último segundo escrito: se reconstruye solo al cambiar de segundo
+        self._last_timestamp = (None, '')
+        # Tamaño conocido de cada CSV: evita stat() por escritura
+        self._sizes: Dict[str, int] = {}
+        # CSV abiertos por tipo de log: (ruta, fichero, writer) hasta rotación o shutdown
+        self._fps: Dict[str, tuple] = {}
         
         # Crear directorios
         os.makedirs(logs_dir, exist_ok=True)
@@ -28,49 +39,83 @@ class AdvancedLogger:
         def flush_worker():
             while self.running:
                 try:
-                    # Flush cada 5 segundos o cuando el buffer esté medio lleno
-                    log_entry = self.log_buffer.get(timeout=5)
-                    if log_entry:
-                        self._write_log_entry_sync(log_entry)
-                    self.log_buffer.task_done()
+                    # Esperar hasta 5 segundos por la primera entrada...
+                    entries = [self.log_buffer.get(timeout=5)]
                 except queue.Empty:
-                    # Timeout, verificar si hay elementos en buffer
-                    self._flush_buffer()
+                    continue
+                # ...y vaciar de una vez lo que se haya acumulado
+                with self.flush_lock:
+                    entries.extend(self._drain_buffer())
+                    self._write_log_batch(entries)
         self.flush_thread = threading.Thread(target=flush_worker, daemon=True)
         self.flush_thread.start()
     
     def _write_log_entry_sync(self, log_entry: Dict[str, Any]):
         """Escritura síncrona de log entry"""
         log_type = log_entry['type']
-        headers = log_entry['headers']
-        data = log_entry['data']
-        
-        log_path = self._get_current_log_path(log_type)
-        
-        if self._needs_rotation(log_path):
-            self._rotate_log(log_type)
-            log_path = self._get_current_log_path(log_type)
-        
-        file_exists = os.path.exists(log_path)
         
         try:
-            with open(log_path, mode='a', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                
-                if not file_exists:
-                    writer.writerow(headers + ['timestamp'])
-                
-                writer.writerow(data + [datetime.now().isoformat()])
+            with self.flush_lock:
+                log_path = self._write_rows(
+                    log_type, log_entry['headers'],
+                    [log_entry['data'] + [self._iso_timestamp(time.time())]]
+                )
             
-            print(f"[{datetime.now()}] Log entry added to {log_path}")
+            _log.debug("Log entry added to %s", log_path)
             return True
             
         except Exception as e:
-            print(f"[ERROR] Could not write to log: {e}")
+            _log.error("Could not write to log: %s", e)
+            self._close_writer(log_type)
             # Intentar escribir en log de emergencia
             self._write_emergency_log(log_entry, str(e))
             return False
     
+    def _get_writer(self, log_type: str, headers: List[str]):
+        """(ruta, fichero, writer) abierto para el log actual; rota y reabre si hace falta"""
+        log_path = self._get_current_log_path(log_type)
+        
+        if self._needs_rotation(log_path):
+            self._rotate_log(log_type)
+            log_path = self._get_current_log_path(log_type)
+        
+        entry = self._fps.get(log_type)
+        if entry is None or entry[0] != log_path:  # primera vez o cambio de día
+            self._close_writer(log_type)
+            file = open(log_path, mode='a', newline='', encoding='utf-8')
+            writer = csv.writer(file)
+            
+            if self._cached_size(log_path) == 0:
+                writer.writerow(headers + ['timestamp'])
+            
+            entry = self._fps[log_type] = (log_path, file, writer)
+        return entry
+    
+    def _write_rows(self, log_type: str, headers: List[str], rows) -> str:
+        """Escribe filas en el CSV abierto del tipo; flush al SO y tamaño actualizado"""
+        log_path, file, writer = self._get_writer(log_type, headers)
+        writer.writerows(rows)
+        file.flush()
+        self._sizes[log_path] = file.tell()
+        return log_path
+    
+    def _close_writer(self, log_type: str):
+        entry = self._fps.pop(log_type, None)
+        if entry is not None:
+            try:
+                entry[1].close()
+            except OSError:
+                pass
+    
+    def _iso_timestamp(self, epoch: float) -> str:
+        """Timestamp ISO con resolución de segundos, cacheado por segundo"""
+        sec = int(epoch)
+        cached_sec, iso = self._last_timestamp  # tupla: lectura atómica entre hilos
+        if sec != cached_sec:
+            iso = datetime.fromtimestamp(sec).isoformat()
+            self._last_timestamp = (sec, iso)
+        return iso
+    
     def _write_emergency_log(self, log_entry: Dict[str, Any], error: str):
         """Log de emergencia si el log principal falla"""
         emergency_path = os.path.join(self.logs_dir, 'emergency.log')
@@ -80,16 +125,47 @@ class AdvancedLogger:
         except:
             pass  # Último recurso fallido
     
+    def _drain_buffer(self) -> List[Dict[str, Any]]:
+        """Sacar del buffer todo lo pendiente (hasta buffer_size entradas)"""
+        entries = []
+        while len(entries) < self.buffer_size:
+            try:
+                entries.append(self.log_buffer.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+    
+    def _write_log_batch(self, entries: List[Dict[str, Any]]):
+        """Escribir un lote: un writerows() por tipo de log sobre el CSV ya abierto"""
+        by_type = {}
+        for log_entry in entries:
+            by_type.setdefault(log_entry['type'], []).append(log_entry)
+        
+        for log_type, group in by_type.items():
+            try:
+                log_path = self._write_rows(
+                    log_type, group[0]['headers'],
+                    [log_entry['data'] + [self._iso_timestamp(log_entry['timestamp'])] for log_entry in group]
+                )
+                
+                _log.debug("%d log entries added to %s", len(group), log_path)
+                
+            except Exception as e:
+                _log.error("Could not write to log: %s", e)
+                self._close_writer(log_type)
+                for log_entry in group:
+                    self._write_emergency_log(log_entry, str(e))
+        
+        for _ in entries:
+            self.log_buffer.task_done()
+    
     def _flush_buffer(self):
         """Vaciar buffer completo de manera segura"""
         with self.flush_lock:
-            while not self.log_buffer.empty():
-                try:
-                    log_entry = self.log_buffer.get_nowait()
-                    self._write_log_entry_sync(log_entry)
-                    self.log_buffer.task_done()
-                except queue.Empty:
-                    break
+            entries = self._drain_buffer()
+            while entries:
+                self._write_log_batch(entries)
+                entries = self._drain_buffer()
     
     def log_event(self, log_type: str, headers: List[str], data: List[Any]):
         """Log event con buffer para alta concurrencia"""
@@ -97,7 +173,7 @@ class AdvancedLogger:
             'type': log_type,
             'headers': headers,
             'data': data,
-            'timestamp': datetime.now()
+            'timestamp': time.time()  # epoch: sin objeto datetime por entrada
         }
         
         try:
@@ -123,17 +199,25 @@ class AdvancedLogger:
         date_str = datetime.now().strftime('%Y%m%d')
         return os.path.join(self.logs_dir, f'{log_type}_{date_str}.csv')
     
+    def _cached_size(self, file_path: str) -> int:
+        """Tamaño del fichero; stat() solo la primera vez que se ve la ruta"""
+        size = self._sizes.get(file_path)
+        if size is None:
+            size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            self._sizes[file_path] = size
+        return size
+    
     def _needs_rotation(self, file_path: str) -> bool:
-        if not os.path.exists(file_path):
-            return False
-        return os.path.getsize(file_path) >= self.max_file_size
+        return self._cached_size(file_path) >= self.max_file_size
     
     def _rotate_log(self, log_type: str):
+        self._close_writer(log_type)  # cerrar antes de renombrar
         current_path = self._get_current_log_path(log_type)
         if os.path.exists(current_path):
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             archived_path = os.path.join(self.logs_dir, f'archive/{log_type}_{timestamp}.csv')
             os.rename(current_path, archived_path)
+        self._sizes.pop(current_path, None)
     
     def log_archivo(self, usuario: str, accion: str, nombre_archivo: str, tamano: int = None):
         headers = ['usuario', 'accion', 'archivo', 'tamano_bytes']
@@ -151,6 +235,9 @@ class AdvancedLogger:
         if self.flush_thread:
             self.flush_thread.join(timeout=5)
         self._flush_buffer()  # Último flush
+        with self.flush_lock:
+            for log_type in list(self._fps):
+                self._close_writer(log_type)
 
 # Función de compatibilidad
 def generar_log(path: str, headers: list, rows: list[list]):
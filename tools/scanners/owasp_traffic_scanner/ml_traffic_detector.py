@@ -1,12 +1,34 @@
 # src/services/advanced_traffic_analyzer.py
 import re
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
 import joblib
 import pandas as pd
 from datetime import datetime
 import json
+from functools import lru_cache
+
+try:
+    import rure  # RureSet del crate `regex` de Rust: DFA perezoso, una pasada
+except ImportError:
+    rure = None
+
+try:
+    from .regex_engines import (
+        build_automaton, union_source, end_anchor_source, compile_union, build_hs_db, hs_matches
+    )
+except ImportError:  # ejecutado como script, fuera del paquete
+    from regex_engines import (
+        build_automaton, union_source, end_anchor_source, compile_union, build_hs_db, hs_matches
+    )
+
+
+def _ascii_lower(text: str) -> str:
+    """Minúsculas solo para texto ASCII: fuera de ASCII lower() puede alargar el texto
+    ('İ' -> 'i̇') y mover los límites de \\b/\\w, así que se conserva el original"""
+    return text.lower() if text.isascii() else text
+
 
 class AdvancedTrafficAnalyzer:
     """
@@ -15,7 +37,31 @@ class AdvancedTrafficAnalyzer:
     """
     
     def __init__(self, model_path=None):
-        self.regex_patterns = self._load_regex_patterns()
+        sources = self._load_regex_patterns()
+        self.literal_anchors = self._load_literal_anchors()
+        # Anclas literales + firmas de scanners en un solo autómata: categorías presentes en una pasada
+        self._literal_ac = build_automaton({**self.literal_anchors, 'scanners': sources['scanners']})
+        # Una alternancia compilada por categoría; 'scanners' son subcadenas, no regex
+        self.regex_patterns = {
+            threat_type: patterns if threat_type == 'scanners' else compile_union(patterns)
+            for threat_type, patterns in sources.items()
+        }
+        # Categorías regex en orden: el id en Hyperscan es su índice
+        self._regex_categories = [t for t in sources if t != 'scanners']
+        self._regex_db = build_hs_db([union_source(sources[t]) for t in self._regex_categories])
+        # Sin Hyperscan: RureSet de rure (un FFI por texto, mismo orden de categorías; solo bytes ASCII)
+        self._regex_set = None
+        if self._regex_db is None and rure is not None:
+            self._regex_set = rure.RureSet(*[
+                end_anchor_source(union_source(sources[t])).encode() for t in self._regex_categories
+            ])
+        # Texto no ASCII: IGNORECASE sobre el original, con `re`
+        self._unicode_patterns = {
+            t: re.compile(union_source(sources[t]), re.IGNORECASE) for t in self._regex_categories
+        }
+        
+        # Tráfico repetitivo (mismas rutas, mismos user-agents): (ML, regex) memoizado por texto
+        self._analysis_cache = lru_cache(maxsize=100_000)(self._analyze_uncached)
         
         # ✅ MODELO DE ML - Una vez entrenado es O(1) para predicción
         self.ml_model = None
@@ -28,11 +74,11 @@ class AdvancedTrafficAnalyzer:
             self._init_ml_model()
     
     def _load_regex_patterns(self):
-        """Patrones regex optimizados - O(1) en acceso"""
+        """Patrones regex optimizados - O(1) en acceso. En minúsculas: el texto llega ya en minúsculas"""
         return {
             'sql_injection': [
-                r"(\bUNION\b.*\bSELECT\b)", r"(\bDROP\b.*\bTABLE\b)",
-                r"(';\s*--|';$)", r"(\bOR\b.*1=1)", r"(\bEXEC\b.*\()"
+                r"(\bunion\b.*\bselect\b)", r"(\bdrop\b.*\btable\b)",
+                r"(';\s*--|';$)", r"(\bor\b.*1=1)", r"(\bexec\b.*\()"
             ],
             'xss': [
                 r"<script[^>]*>.*?</script>", r"javascript:", 
@@ -42,6 +88,17 @@ class AdvancedTrafficAnalyzer:
             'path_traversal': [r'\.\./', r'\.\.\\', r'etc/passwd', r'win.ini']
         }
     
+    def _load_literal_anchors(self):
+        """
+        Subcadenas (en minúsculas) que todo match de la categoría contiene: basta con
+        que ninguna aparezca para descartar la categoría sin ejecutar la regex
+        """
+        return {
+            'sql_injection': ('union', 'drop', "';", '1=1', 'exec'),
+            'xss': ('<script', 'javascript:', '=', 'alert', '<iframe'),
+            'path_traversal': ('..', 'etc/passwd', 'win')
+        }
+    
     def _init_ml_model(self):
         """Inicializar modelo de ML con datos de entrenamiento sintéticos"""
         # ✅ DATOS DE ENTRENAMIENTO SINTÉTICOS (en producción usar datos reales)
@@ -59,19 +116,20 @@ class AdvancedTrafficAnalyzer:
         
         texts, labels = zip(*training_data)
         
-        # ✅ VECTORIZACIÓN TF-IDF
-        self.vectorizer = TfidfVectorizer(
-            max_features=1000,
+        # ✅ VECTORIZACIÓN POR HASHING - sin vocabulario que ajustar ni guardar
+        self.vectorizer = HashingVectorizer(
+            n_features=2**14,  # 16K columnas: pesos del modelo pequeños, pocas colisiones en este vocabulario
             ngram_range=(1, 2),
-            stop_words='english'
+            stop_words='english',
+            alternate_sign=False,
+            norm='l2'
         )
         
-        X = self.vectorizer.fit_transform(texts)
+        X = self.vectorizer.transform(texts)
         
-        # ✅ MODELO RANDOM FOREST
-        self.ml_model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
+        # ✅ MODELO LINEAL (regresión logística por SGD) - predicción = un producto escalar
+        self.ml_model = SGDClassifier(
+            loss='log_loss',
             random_state=42
         )
         
@@ -79,6 +137,7 @@ class AdvancedTrafficAnalyzer:
         
         # Calcular accuracy básico
         self.model_accuracy = self.ml_model.score(X, labels)
+        self._analysis_cache.cache_clear()  # Predicciones del modelo anterior ya no valen
         print(f"✅ Modelo ML entrenado - Accuracy: {self.model_accuracy:.2f}")
     
     def analyze_with_ml(self, text: str) -> dict:
@@ -91,12 +150,27 @@ class AdvancedTrafficAnalyzer:
         # Vectorizar texto de entrada - O(1) para transformación
         text_vectorized = self.vectorizer.transform([text])
         
-        # Predecir - O(1) para Random Forest entrenado
-        prediction = self.ml_model.predict(text_vectorized)[0]
+        # Predecir - O(1): una sola llamada, la clase sale de la probabilidad
         probability = self.ml_model.predict_proba(text_vectorized)[0][1]
         
+        return self._ml_result(probability)
+    
+    def analyze_with_ml_batch(self, texts: list) -> list:
+        """
+        Análisis ML de un lote: un solo transform + predict_proba para todos los textos
+        """
+        if not self.ml_model:
+            return [{"threat_level": 0, "confidence": 0.0} for _ in texts]
+        
+        if not texts:
+            return []
+        
+        probabilities = self.ml_model.predict_proba(self.vectorizer.transform(texts))[:, 1]
+        return [self._ml_result(probability) for probability in probabilities]
+    
+    def _ml_result(self, probability) -> dict:
         return {
-            "threat_level": prediction,
+            "threat_level": int(probability > 0.5),  # como predict(): decision_function > 0, un empate es benigno
             "confidence": float(probability),
             "model_accuracy": self.model_accuracy
         }
@@ -105,19 +179,73 @@ class AdvancedTrafficAnalyzer:
         """
         Análisis con regex - COMPLEJIDAD: O(n*m) donde n=patrones, m=longitud texto
         """
+        return self._analyze_text(_ascii_lower(text))
+    
+    def _analyze_text(self, text: str) -> dict:
+        """Análisis regex sobre texto ya pasado por _ascii_lower"""
+        if text.isascii():
+            return self._analyze_lowered(text)
+        return self._analyze_unicode(text)
+    
+    def _analyze_unicode(self, text: str) -> dict:
+        """Texto no ASCII: cada categoría con IGNORECASE sobre el texto original, como el análisis base"""
         threats_detected = []
         
         for threat_type, patterns in self.regex_patterns.items():
             if threat_type == 'scanners':
-                # Para scanners, verificar en user-agent
                 if any(scanner in text.lower() for scanner in patterns):
                     threats_detected.append(threat_type)
-            else:
-                # Para regex patterns
-                for pattern in patterns:
-                    if re.search(pattern, text, re.IGNORECASE):
-                        threats_detected.append(threat_type)
-                        break  # Un match por categoría es suficiente
+            elif self._unicode_patterns[threat_type].search(text):
+                threats_detected.append(threat_type)
+        
+        return {
+            "threats_detected": threats_detected,
+            "threat_count": len(threats_detected)
+        }
+    
+    def _analyze_lowered(self, lowered: str) -> dict:
+        """Análisis regex sobre texto ya en minúsculas (patrones sin IGNORECASE)"""
+        threats_detected = []
+        
+        # Prefiltro literal: mucho más barato que cualquier motor regex
+        if self._literal_ac is not None:
+            present = set()
+            for _, keys in self._literal_ac.iter(lowered):
+                present |= keys
+            scanner_hit = 'scanners' in present
+            candidates = present - {'scanners'}
+        else:
+            scanner_hit = any(scanner in lowered for scanner in self.regex_patterns['scanners'])
+            candidates = {
+                t for t in self._regex_categories
+                if any(anchor in lowered for anchor in self.literal_anchors[t])
+            }
+        
+        if not candidates:
+            regex_hits = set()  # tráfico benigno típico: ninguna regex que ejecutar
+        elif self._regex_db is not None and lowered.isascii():
+            # Todas las categorías en una sola pasada
+            hits = hs_matches(self._regex_db, lowered)
+            regex_hits = {self._regex_categories[i] for i in hits}
+        elif self._regex_set is not None and lowered.isascii():
+            matched = self._regex_set.matches(lowered.encode('utf-8', 'replace'))
+            regex_hits = {t for t, hit in zip(self._regex_categories, matched) if hit}
+        else:
+            regex_hits = None
+        
+        for threat_type, patterns in self.regex_patterns.items():
+            if threat_type == 'scanners':
+                # Para scanners, verificar en user-agent
+                if scanner_hit:
+                    threats_detected.append(threat_type)
+            elif threat_type not in candidates:
+                continue
+            elif regex_hits is not None:
+                if threat_type in regex_hits:
+                    threats_detected.append(threat_type)
+            elif patterns.search(lowered):
+                # Un match por categoría es suficiente: una alternancia por categoría
+                threats_detected.append(threat_type)
         
         return {
             "threats_detected": threats_detected,
@@ -129,14 +257,36 @@ class AdvancedTrafficAnalyzer:
         Análisis HÍBRIDO: ML + Regex
         COMPLEJIDAD: O(1) + O(n*m) ≈ O(n*m) pero optimizado
         """
-        text_to_analyze = f"{log_data.get('path', '')} {log_data.get('payload', '')} {log_data.get('user_agent', '')}"
-        
+        ml_result, regex_result = self._analysis_cache(self._text_of(log_data))
+        return self._combine(log_data, ml_result, regex_result)
+    
+    def _analyze_uncached(self, text: str) -> tuple:
         # ✅ ANÁLISIS ML (RÁPIDO - O(1))
-        ml_result = self.analyze_with_ml(text_to_analyze)
+        ml_result = self.analyze_with_ml(text)
         
         # ✅ ANÁLISIS REGEX (DETALLADO - O(n*m))
-        regex_result = self.analyze_with_regex(text_to_analyze)
+        regex_result = self._analyze_text(text)
+        
+        return ml_result, regex_result
+    
+    def analyze_batch(self, log_data_list: list) -> list:
+        """
+        Análisis HÍBRIDO de un lote de logs: el coste por llamada de sklearn se paga una vez
+        """
+        texts = [self._text_of(log_data) for log_data in log_data_list]
+        ml_results = self.analyze_with_ml_batch(texts)
         
+        return [
+            self._combine(log_data, ml_result, self._analyze_text(text))
+            for log_data, text, ml_result in zip(log_data_list, texts, ml_results)
+        ]
+    
+    @staticmethod
+    def _text_of(log_data: dict) -> str:
+        """Texto combinado del log, pasado a minúsculas (si es ASCII) una sola vez para todos los detectores"""
+        return _ascii_lower(f"{log_data.get('path', '')} {log_data.get('payload', '')} {log_data.get('user_agent', '')}")
+    
+    def _combine(self, log_data: dict, ml_result: dict, regex_result: dict) -> dict:
         # ✅ FUSIÓN DE RESULTADOS
         combined_threat_level = ml_result['threat_level']
         confidence = ml_result['confidence']
@@ -173,6 +323,7 @@ class AdvancedTrafficAnalyzer:
             self.ml_model = model_data['model']
             self.vectorizer = model_data['vectorizer']
             self.model_accuracy = model_data['accuracy']
+            self._analysis_cache.cache_clear()
             print(f"✅ Modelo cargado - Accuracy: {self.model_accuracy:.2f}")
         except Exception as e:
             print(f"❌ Error cargando modelo: {e}")
@@ -202,17 +353,7 @@ class PiChatAdvancedTrafficAnalyzer:
         
         if self.use_ml and self.analyzer:
             # ✅ USAR ANÁLISIS HÍBRIDO AVANZADO
-            result = self.analyzer.hybrid_analysis(log_data)
-            
-            if result['final_threat_level'] == 1:
-                self.stats['threats_detected'] += 1
-                self.stats['ml_predictions'] += 1
-                
-                # Registrar tipo de amenaza
-                for threat in result['specific_threats']:
-                    self.stats['threats_by_type'][threat] = self.stats['threats_by_type'].get(threat, 0) + 1
-                
-                return self._create_alert(result)
+            return self._handle_result(self.analyzer.hybrid_analysis(log_data))
         
         else:
             # ✅ FALLBACK A ANÁLISIS REGEX (como tenías antes)
@@ -226,6 +367,27 @@ class PiChatAdvancedTrafficAnalyzer:
         
         return None
     
+    def analyze_log_lines(self, log_data_list: list) -> list:
+        """Versión por lotes de analyze_log_line: una alerta (o None) por log"""
+        if not (self.use_ml and self.analyzer):
+            return [self.analyze_log_line(log_data) for log_data in log_data_list]
+        
+        self.stats['total_requests'] += len(log_data_list)
+        return [self._handle_result(result) for result in self.analyzer.analyze_batch(log_data_list)]
+    
+    def _handle_result(self, result: dict):
+        """Estadísticas y alerta para un resultado híbrido"""
+        if result['final_threat_level'] == 1:
+            self.stats['threats_detected'] += 1
+            self.stats['ml_predictions'] += 1
+            
+            # Registrar tipo de amenaza
+            for threat in result['specific_threats']:
+                self.stats['threats_by_type'][threat] = self.stats['threats_by_type'].get(threat, 0) + 1
+            
+            return self._create_alert(result)
+        return None
+    
     def _basic_regex_analysis(self, text: str):
         """Análisis básico regex (tu implementación original)"""
         # ... (tu código regex actual)
@@ -0,0 +1,98 @@
+# src/services/regex_engines.py
+# Motores de búsqueda compartidos por traffic_analyzer y ml_traffic_detector
+import re
+
+try:
+    import ahocorasick  # pyahocorasick: todas las subcadenas fijas en una sola pasada
+except ImportError:
+    ahocorasick = None
+
+try:
+    import hyperscan
+except ImportError:  # sin Hyperscan: una búsqueda por categoría
+    hyperscan = None
+
+try:
+    import pcre2  # PCRE2 con JIT: búsqueda en código nativo
+except ImportError:
+    pcre2 = None
+
+try:
+    import re2  # google-re2: tiempo lineal, sin backtracking catastrófico
+except ImportError:
+    re2 = None
+
+
+def build_automaton(words_by_key):
+    """Aho-Corasick sobre {clave: palabras}: cada palabra -> claves que la contienen (None sin pyahocorasick)"""
+    if ahocorasick is None:
+        return None
+    keys_by_word = {}
+    for key, words in words_by_key.items():
+        for word in words:
+            keys_by_word.setdefault(word, set()).add(key)
+    automaton = ahocorasick.Automaton()
+    for word, keys in keys_by_word.items():
+        automaton.add_word(word, frozenset(keys))
+    automaton.make_automaton()
+    return automaton
+
+
+def union_source(patterns):
+    return "|".join(f"(?:{pattern})" for pattern in patterns)
+
+
+def end_anchor_source(source):
+    """`$` al estilo de `re` (fin o antes de un \\n final) para RE2/rure, donde `$` es solo el fin.
+    Los patrones no llevan `$` dentro de clases de caracteres."""
+    return re.sub(r'(?<!\\)\$', r'(?:\\n?\\z)', source)
+
+
+class _AsciiUnion:
+    """Motor nativo para texto ASCII y `re` para el resto: en RE2 \\w y \\b son solo ASCII y en
+    PCRE2 son Unicode pero no como en `re` (una marca combinante es \\w y rompe `\\bunion\\b`)"""
+
+    def __init__(self, native, union):
+        self._native = native
+        self._re = re.compile(union)
+
+    def search(self, text):
+        return (self._native if text.isascii() else self._re).search(text)
+
+
+def compile_union(patterns):
+    """Alternancia de los patrones (en minúsculas) para texto ya en minúsculas: PCRE2 JIT, RE2 o `re`"""
+    union = union_source(patterns)
+    if pcre2 is not None:
+        try:
+            return _AsciiUnion(pcre2.compile(union, jit=True), union)
+        except Exception:  # plataforma sin soporte JIT (sljit)
+            return _AsciiUnion(pcre2.compile(union), union)
+    if re2 is not None:
+        return _AsciiUnion(re2.compile(end_anchor_source(union)), union)
+    return re.compile(union)
+
+
+def build_hs_db(expressions):
+    """Base Hyperscan con una expresión por id (None si Hyperscan no está)"""
+    if hyperscan is None:
+        return None
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[expression.encode() for expression in expressions],
+        ids=list(range(len(expressions))),
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions)  # texto ya en minúsculas
+    )
+    return db
+
+
+def hs_matches(db, text):
+    """Ids de las expresiones que aparecen en el texto, en una sola pasada DFA.
+    Solo para texto ASCII: en Hyperscan \\w y \\b son ASCII (UCP no admite \\b)"""
+    hits = set()
+
+    def on_match(pattern_id, start, end, flags, context):
+        hits.add(pattern_id)
+
+    db.scan(text.encode('utf-8', 'replace'), match_event_handler=on_match)
+    return hits
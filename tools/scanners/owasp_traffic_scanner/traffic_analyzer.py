@@ -1,12 +1,31 @@
 # src/services/traffic_analyzer.py
-import re
 import json
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from confluent_kafka import Producer, Consumer
+import atexit
 import logging
+from collections import defaultdict
+
+try:
+    import orjson  # serializa directo a bytes, 2-5x más rápido que json
+except ImportError:
+    orjson = None
+
+try:
+    from .regex_engines import build_automaton, union_source, compile_union, build_hs_db, hs_matches
+except ImportError:  # ejecutado como script, fuera del paquete
+    from regex_engines import build_automaton, union_source, compile_union, build_hs_db, hs_matches
+
+
+def _dumps(data) -> bytes:
+    """JSON en bytes UTF-8: orjson si está, si no json + encode"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode('utf-8')
+
 
 @dataclass
 class SecurityAlert:
@@ -23,18 +42,42 @@ class PiChatTrafficAnalyzer:
     Versión compatible con Python 3.11+
     """
     
-    # Patrones de detección OWASP
+    # Patrones de detección OWASP, en minúsculas: se aplican a texto ya pasado a minúsculas
     SQL_INJECTION_PATTERNS = [
-        r"(\bUNION\b.*\bSELECT\b)",
-        r"(\bDROP\b.*\bTABLE\b)",
-        r"(\bINSERT\b.*\bINTO\b)",
-        r"(\bDELETE\b.*\bFROM\b)",
-        r"(\bOR\b.*1=1)",
-        r"(\bEXEC\b.*\()",
-        r"(\bWAITFOR\b.*\bDELAY\b)",
+        r"(\bunion\b.*\bselect\b)",
+        r"(\bdrop\b.*\btable\b)",
+        r"(\binsert\b.*\binto\b)",
+        r"(\bdelete\b.*\bfrom\b)",
+        r"(\bor\b.*1=1)",
+        r"(\bexec\b.*\()",
+        r"(\bwaitfor\b.*\bdelay\b)",
         r"(';\s*--|';$)",
     ]
     
+    XSS_PATTERNS = [
+        r"<script[^>]*>.*?</script>",
+        r"javascript:",
+        r"on\w+\s*=",
+    ]
+    
+    PATH_TRAVERSAL_PATTERNS = [r'\.\./', r'\.\.\\', r'etc/passwd', r'win.ini']
+    
+    # Subcadenas (en minúsculas) presentes en todo match de cada clase: prefiltro antes de la regex
+    SQL_INJECTION_ANCHORS = ('union', 'drop', 'insert', 'delete', '1=1', 'exec', 'waitfor', "';")
+    XSS_ANCHORS = ('<script', 'javascript:', '=')
+    PATH_TRAVERSAL_ANCHORS = ('..', 'etc/passwd', 'win')
+    
+    # Una alternancia compilada por clase de amenaza: una sola pasada por el texto
+    SQL_INJECTION_RE = compile_union(SQL_INJECTION_PATTERNS)
+    XSS_RE = compile_union(XSS_PATTERNS)
+    PATH_TRAVERSAL_RE = compile_union(PATH_TRAVERSAL_PATTERNS)
+    
+    # SQLi (id 0) y XSS (id 1) se escanean juntos sobre el mismo texto
+    PAYLOAD_DB = build_hs_db([union_source(SQL_INJECTION_PATTERNS), union_source(XSS_PATTERNS)])
+    
+    SCANNERS = ("sqlmap", "nmap", "burpsuite", "nikto", "wpscan")
+    SCANNER_AC = build_automaton({'scanner': SCANNERS})
+    
     def __init__(self, kafka_bootstrap_servers: str = 'localhost:9092'):  # Puerto por defecto de Kafka
         self.kafka_config = {
             'bootstrap.servers': kafka_bootstrap_servers,
@@ -42,7 +85,14 @@ class PiChatTrafficAnalyzer:
             'auto.offset.reset': 'earliest'
         }
         
-        self.producer = Producer({'bootstrap.servers': kafka_bootstrap_servers})
+        # Productor asíncrono: librdkafka agrupa mensajes en vuelo (linger/lotes) en vez de esperar cada ack
+        self.producer = Producer({
+            'bootstrap.servers': kafka_bootstrap_servers,
+            'linger.ms': 5,
+            'batch.num.messages': 10000,
+            'compression.type': 'lz4',
+            'queue.buffering.max.messages': 1_000_000
+        })
         self.consumer = Consumer(self.kafka_config)
         self.consumer.subscribe(['raw-requests'])
         
@@ -50,12 +100,16 @@ class PiChatTrafficAnalyzer:
         self.stats = {
             'total_requests': 0,
             'threats_detected': 0,
-            'threats_by_type': {},
-            'requests_by_ip': {},
+            'threats_by_type': defaultdict(int),
+            'requests_by_ip': defaultdict(int),
             'last_alert_time': None
         }
         
         self.logger = self._setup_logger()
+        
+        # Sin flush por mensaje: las alertas en cola de librdkafka se entregan al salir
+        self._closed = False
+        atexit.register(self.close)
     
     def _setup_logger(self):
         """Configurar logger"""
@@ -89,21 +143,32 @@ class PiChatTrafficAnalyzer:
         
         # Extraer campos del log con valores por defecto
         ip = log_data.get('ip', 'unknown')
-        path = log_data.get('path', '')
+        # Cada campo se pasa a minúsculas una sola vez; los detectores reciben solo lo que usan
+        path = log_data.get('path', '').lower()
         user_agent = log_data.get('user_agent', '').lower()
         method = log_data.get('method', '')
         payload = log_data.get('payload', '')
         
         # Actualizar estadísticas por IP
-        self.stats['requests_by_ip'][ip] = self.stats['requests_by_ip'].get(ip, 0) + 1
+        self.stats['requests_by_ip'][ip] += 1
         
         # Combinar datos para análisis
-        analysis_text = f"{path} {payload}".lower()
+        analysis_text = f"{path} {str(payload).lower()}"
+        
+        # Detección de amenazas (SQLi + XSS en una sola pasada si hay Hyperscan)
+        if self.PAYLOAD_DB is not None and analysis_text.isascii():
+            if self._may_match(analysis_text, self.SQL_INJECTION_ANCHORS + self.XSS_ANCHORS):
+                hits = hs_matches(self.PAYLOAD_DB, analysis_text)
+            else:
+                hits = ()
+            sql_detected, xss_detected = 0 in hits, 1 in hits
+        else:
+            sql_detected = self._detect_sql_injection(analysis_text)
+            xss_detected = self._detect_xss(analysis_text)
         
-        # Detección de amenazas
         threats = [
-            ('SQL Injection', self._detect_sql_injection(analysis_text)),
-            ('XSS', self._detect_xss(analysis_text)),
+            ('SQL Injection', sql_detected),
+            ('XSS', xss_detected),
             ('Scanner', self._detect_scanner(user_agent)),
             ('Path Traversal', self._detect_path_traversal(path)),
         ]
@@ -120,45 +185,45 @@ class PiChatTrafficAnalyzer:
         
         return None
     
+    @staticmethod
+    def _may_match(lowered: str, anchors) -> bool:
+        """Prefiltro literal: False si ninguna subcadena obligatoria aparece"""
+        return any(anchor in lowered for anchor in anchors)
+    
     def _detect_sql_injection(self, text: str) -> bool:
-        """Detección de SQL Injection"""
-        for pattern in self.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
-                return True
-        return False
+        """Detección de SQL Injection (text en minúsculas)"""
+        return (self._may_match(text, self.SQL_INJECTION_ANCHORS)
+                and self.SQL_INJECTION_RE.search(text) is not None)
     
     def _detect_xss(self, text: str) -> bool:
-        """Detección de XSS"""
-        xss_patterns = [
-            r"<script[^>]*>.*?</script>",
-            r"javascript:",
-            r"on\w+\s*=",
-        ]
-        return any(re.search(pattern, text, re.IGNORECASE) for pattern in xss_patterns)
+        """Detección de XSS (text en minúsculas)"""
+        return self._may_match(text, self.XSS_ANCHORS) and self.XSS_RE.search(text) is not None
     
     def _detect_scanner(self, user_agent: str) -> bool:
-        """Detección de scanners"""
-        scanners = ["sqlmap", "nmap", "burpsuite", "nikto", "wpscan"]
-        return any(scanner in user_agent for scanner in scanners)
+        """Detección de scanners (user_agent en minúsculas)"""
+        if self.SCANNER_AC is not None:
+            return next(self.SCANNER_AC.iter(user_agent), None) is not None
+        return any(scanner in user_agent for scanner in self.SCANNERS)
     
     def _detect_path_traversal(self, path: str) -> bool:
-        """Detección de path traversal"""
-        patterns = [r'\.\./', r'\.\.\\', r'etc/passwd', r'win.ini']
-        return any(re.search(pattern, path, re.IGNORECASE) for pattern in patterns)
+        """Detección de path traversal (path en minúsculas)"""
+        return (self._may_match(path, self.PATH_TRAVERSAL_ANCHORS)
+                and self.PATH_TRAVERSAL_RE.search(path) is not None)
     
     def _create_alert(self, threat_type: str, severity: str, 
                      description: str, payload: str, ip: str) -> SecurityAlert:
         """Crear alerta de seguridad"""
+        timestamp = datetime.now().isoformat()  # una vez: alerta y estadísticas comparten instante
         self.stats['threats_detected'] += 1
-        self.stats['threats_by_type'][threat_type] = self.stats['threats_by_type'].get(threat_type, 0) + 1
-        self.stats['last_alert_time'] = datetime.now().isoformat()
+        self.stats['threats_by_type'][threat_type] += 1
+        self.stats['last_alert_time'] = timestamp
         
         return SecurityAlert(
             threat_type=threat_type,
             severity=severity,
             description=description,
             payload=payload,
-            timestamp=datetime.now().isoformat(),
+            timestamp=timestamp,
             source_ip=ip
         )
     
@@ -174,15 +239,34 @@ class PiChatTrafficAnalyzer:
                 'source_ip': alert.source_ip
             }
             
+            message = _dumps(alert_data)
             self.producer.produce(
                 'security-alerts', 
-                json.dumps(alert_data).encode('utf-8'),
+                message,
                 callback=self.delivery_report
             )
-            self.producer.flush()
+            self.producer.poll(0)  # atender callbacks de entrega sin bloquear
             
+        except BufferError:
+            # Cola local llena: esperar a que se vacíe un poco y reintentar una vez
+            self.producer.poll(1)
+            try:
+                self.producer.produce('security-alerts', message, callback=self.delivery_report)
+            except Exception as e:
+                self.logger.error(f"Error publishing alert: {e}")
         except Exception as e:
             self.logger.error(f"Error publishing alert: {e}")
+    
+    def close(self, timeout: float = 10.0):
+        """Entregar las alertas pendientes y cerrar el consumidor (idempotente)"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        remaining = self.producer.flush(timeout)
+        if remaining:
+            self.logger.warning(f"{remaining} alerts not delivered before shutdown")
+        self.consumer.close()
 
 # Versión simplificada para testing sin Kafka
 class MockTrafficAnalyzer:
@@ -213,6 +297,9 @@ class MockTrafficAnalyzer:
                 source_ip=log_data.get('ip', 'unknown')
             )
         return None
+    
+    def close(self, timeout: float = 10.0):
+        """Sin Kafka no hay nada pendiente: misma interfaz que PiChatTrafficAnalyzer"""
 
 # Factory para elegir el analizador apropiado
 def create_traffic_analyzer(use_kafka: bool = False):
@@ -241,4 +328,5 @@ if __name__ == "__main__":
         if alert:
             print(f"🚨 {alert.threat_type}: {alert.description}")
     
+    analyzer.close()  # con Kafka: entrega las alertas aún en cola
     print("✅ Traffic Analyzer funcionando correctamente")
@@ -17,61 +17,125 @@
 # junto con este programa. En caso contrario, consulte <https://www.gnu.org/licenses/>.
 
 import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # sin numpy el modo lote usa password_entropy línea a línea
+    np = None
+
+try:
+    from numba import njit, prange
+    _NUMBA = True
+except ImportError:  # sin Numba el modo lote usa password_entropy línea a línea
+    _NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Bits de clase: 1 = minúscula, 2 = mayúscula, 4 = dígito, 8 = símbolo
+def _char_class(c):
+    return ((1 if c.islower() else 0) | (2 if c.isupper() else 0) |
+            (4 if c.isdigit() else 0) | (8 if not c.isalnum() else 0))
+
+# Tabla de 256 bytes para bytes.translate (solo se usa con texto ASCII)
+_CLASS_LUT = bytes(_char_class(chr(i)) if i < 128 else 0 for i in range(256))
+
+def _charset_size(password):
+    """Tamaño del alfabeto usado: una sola pasada (translate en C para ASCII)."""
+    if password.isascii():
+        classes = set(password.encode('ascii').translate(_CLASS_LUT))
+    else:
+        classes = {_char_class(c) for c in password}
+
+    mask = 0
+    for bits in classes:
+        mask |= bits
+
+    return ((26 if mask & 1 else 0) +
+            (26 if mask & 2 else 0) +
+            (10 if mask & 4 else 0) +
+            (32 if mask & 8 else 0))  # aprox cantidad de símbolos ASCII imprimibles
 
 def password_entropy(password):
     """Calcula la entropía estimada de una contraseña en bits."""
-    charset_size = 0
-
-    lowers = any(c.islower() for c in password)
-    uppers = any(c.isupper() for c in password)
-    digits = any(c.isdigit() for c in password)
-    symbols = any(not c.isalnum() for c in password)
-
-    if lowers:
-        charset_size += 26
-    if uppers:
-        charset_size += 26
-    if digits:
-        charset_size += 10
-    if symbols:
-        # aprox cantidad de símbolos ASCII imprimibles
-        charset_size += 32  
-
-    entropy = math.log2(charset_size ** len(password))
-    return entropy
+    charset_size = _charset_size(password)
+
+    # log2(c ** n) == n * log2(c): sin enteros gigantes
+    return len(password) * math.log2(charset_size) if charset_size else 0.0
+
+@njit(parallel=True)  # sin cache=True: el índice en disco va ligado a la ruta del módulo
+def _batch_entropy(buf, starts, ends, lut):
+    """Entropía de cada contraseña buf[starts[i]:ends[i]]; NaN si la línea no es ASCII"""
+    n = len(starts)
+    out = np.empty(n)
+    for i in prange(n):
+        mask = 0
+        ascii_only = True
+        for j in range(starts[i], ends[i]):
+            b = buf[j]
+            if b >= 128:
+                ascii_only = False
+                break
+            mask |= int(lut[b])
+        if not ascii_only:
+            out[i] = np.nan
+            continue
+        cs = (mask & 1) * 26 + ((mask >> 1) & 1) * 26 + ((mask >> 2) & 1) * 10 + ((mask >> 3) & 1) * 32
+        out[i] = (ends[i] - starts[i]) * np.log2(cs) if cs else 0.0
+    return out
+
+def _lines(data):
+    """Contraseñas de un archivo: separadas por \n, sin \r final ni línea vacía al final."""
+    lines = data.decode('utf-8', 'replace').split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+def wordlist_entropy(path):
+    """Entropía de cada contraseña (una por línea) de un archivo, p. ej. una parte_{n}.txt de TheButcher."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # El núcleo solo compensa compilado: en Python puro sobre escalares numpy es más
+    # lento que password_entropy (y np.log2 de un uint8 daría float16)
+    if np is None or not _NUMBA or not data:
+        return [password_entropy(line) for line in _lines(data)]
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 0x0A)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buf)]))
+    if data.endswith(b'\n'):  # sin línea vacía final
+        starts, ends = starts[:-1], ends[:-1]
+    # finales CRLF: el \r no forma parte de la contraseña
+    crlf = (ends > starts) & (buf[np.maximum(ends - 1, 0)] == 0x0D)
+    ends = ends - crlf
+
+    entropies = _batch_entropy(buf, starts, ends, np.frombuffer(_CLASS_LUT, dtype=np.uint8))
+
+    # líneas no ASCII: clasificación por carácter en Python (casos raros)
+    for i in np.flatnonzero(np.isnan(entropies)):
+        entropies[i] = password_entropy(data[starts[i]:ends[i]].decode('utf-8', 'replace'))
+    return entropies.tolist()
 
 def crack_time(password, guesses_per_second):
     """Devuelve el tiempo en segundos para crackear (en promedio)."""
-    charset_size = 0
-
-    lowers = any(c.islower() for c in password)
-    uppers = any(c.isupper() for c in password)
-    digits = any(c.isdigit() for c in password)
-    symbols = any(not c.isalnum() for c in password)
-
-    if lowers:
-        charset_size += 26
-    if uppers:
-        charset_size += 26
-    if digits:
-        charset_size += 10
-    if symbols:
-        charset_size += 32
-
-    total_combinations = charset_size ** len(password)
-    # promedio: la mitad del espacio total
-    avg_attempts = total_combinations / 2
-    seconds = avg_attempts / guesses_per_second
-    return seconds
-
-# Ejemplo
-password = input('entra la contrasenia a revisar >> ')
-gps = 1e12  # velocidad estimada de un atacante con hardware especializado
-
-entropy_bits = password_entropy(password)
-time_seconds = crack_time(password, gps)
+    charset_size = _charset_size(password)
+
+    if not charset_size:
+        return 0.5 / guesses_per_second  # contraseña vacía: 1 combinación
+
+    # promedio: la mitad del espacio total; en log2 para no crear el bignum
+    log2_seconds = len(password) * math.log2(charset_size) - 1 - math.log2(guesses_per_second)
+    if log2_seconds >= 1024:  # fuera del rango de float
+        return math.inf
+    return 2.0 ** log2_seconds
 
 def human_time(seconds):
+    if math.isinf(seconds):
+        return "más de 10^300 años"
     units = [
         ("años", 60*60*24*365),
         ("días", 60*60*24),
@@ -87,7 +151,23 @@ def human_time(seconds):
             result.append(f"{value} {name}")
     return ", ".join(result)
 
-print(f"Contraseña: {password}")
-print(f"Entropía estimada: {entropy_bits:.2f} bits")
-print(f"Tiempo de crackeo estimado: {human_time(time_seconds)}")
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Modo lote: archivos con una contraseña por línea (p. ej. partes/parte_*.txt)
+        for path in sys.argv[1:]:
+            with open(path, 'rb') as f:
+                passwords = _lines(f.read())
+            for password, bits in zip(passwords, wordlist_entropy(path)):
+                print(f"{bits:.2f}\t{password}")
+        sys.exit(0)
+
+    # Ejemplo
+    password = input('entra la contrasenia a revisar >> ')
+    gps = 1e12  # velocidad estimada de un atacante con hardware especializado
+
+    entropy_bits = password_entropy(password)
+    time_seconds = crack_time(password, gps)
 
+    print(f"Contraseña: {password}")
+    print(f"Entropía estimada: {entropy_bits:.2f} bits")
+    print(f"Tiempo de crackeo estimado: {human_time(time_seconds)}")
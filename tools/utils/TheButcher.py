@@ -20,6 +20,12 @@ import os
 
 import os
 import asyncio
+import mmap
+
+try:
+    import numpy as np
+except ImportError:  # sin numpy: búsqueda de saltos con mm.find
+    np = None
 
 # Configuración
 ARCHIVO_ORIGEN = "entrada.txt"
@@ -27,41 +33,65 @@ LINEAS_POR_PARTE = 128
 DIRECTORIO_SALIDA = "partes"
 
 
-async def guardar_parte(lineas: list[str], indice: int):
+def _cortes(mm) -> list[int]:
+    """
+    Offsets de fin (exclusivos) de cada parte: el byte tras cada LINEAS_POR_PARTE-ésimo salto de línea.
     """
-    Guarda una parte del archivo en un archivo separado.
+    if np is not None:
+        saltos = np.flatnonzero(np.frombuffer(mm, dtype=np.uint8) == 0x0A)
+        cortes = (saltos[LINEAS_POR_PARTE - 1::LINEAS_POR_PARTE] + 1).tolist()
+    else:
+        # sin numpy: mm.find recorre el buffer en C (memchr)
+        cortes = []
+        pos, n = 0, 0
+        while (pos := mm.find(b"\n", pos) + 1) > 0:
+            n += 1
+            if n % LINEAS_POR_PARTE == 0:
+                cortes.append(pos)
+    if not cortes or cortes[-1] < len(mm):  # última parte incompleta
+        cortes.append(len(mm))
+    return cortes
+
+
+def guardar_parte(fd: int, inicio: int, fin: int, indice: int):
+    """
+    Copia el rango de bytes [inicio, fin) del origen a parte_{indice}.txt.
+    Se ejecuta en un hilo del executor: pread no comparte posición, cada parte va a su propio archivo.
     """
     nombre_archivo = os.path.join(DIRECTORIO_SALIDA, f"parte_{indice}.txt")
-    async with asyncio.Lock():  # asegurar que no choquen las escrituras
-        with open(nombre_archivo, "w", encoding="utf-8") as f:
-            f.writelines(lineas)
+    with open(nombre_archivo, "wb") as f:
+        f.write(os.pread(fd, fin - inicio, inicio))  # sin decodificar líneas
     print(f"[OK] Guardada {nombre_archivo}")
 
 
 async def procesar_archivo():
     """
-    Lee el archivo y lo divide en partes de N lineas.
+    Divide el archivo en partes de N lineas por rangos de bytes.
+    Un pase sobre el mmap localiza los saltos de línea; las copias van a hilos de I/O en paralelo.
     """
     if not os.path.exists(DIRECTORIO_SALIDA):
         os.makedirs(DIRECTORIO_SALIDA)
 
-    with open(ARCHIVO_ORIGEN, "r", encoding="utf-8") as f:
-        lineas = f.readlines()
-
-    # calculamos cuántas partes salen
-    total_lineas = len(lineas)
-    total_partes = (total_lineas + LINEAS_POR_PARTE - 1) // LINEAS_POR_PARTE
-
-    print(f"Archivo con {total_lineas} líneas -> {total_partes} partes")
-
-    tareas = []
-    for i in range(total_partes):
-        inicio = i * LINEAS_POR_PARTE
-        fin = inicio + LINEAS_POR_PARTE
-        chunk = lineas[inicio:fin]
-        tareas.append(asyncio.create_task(guardar_parte(chunk, i + 1)))
-
-    await asyncio.gather(*tareas)
+    loop = asyncio.get_running_loop()
+    fd = os.open(ARCHIVO_ORIGEN, os.O_RDONLY)
+    try:
+        if os.fstat(fd).st_size == 0:  # mmap no admite archivos vacíos
+            print("Archivo con 0 partes")
+            return
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            cortes = _cortes(mm)
+
+        tareas = []
+        inicio = 0
+        for i, fin in enumerate(cortes, start=1):
+            tareas.append(loop.run_in_executor(None, guardar_parte, fd, inicio, fin, i))
+            inicio = fin
+
+        await asyncio.gather(*tareas)
+    finally:
+        os.close(fd)
+
+    print(f"Archivo de {cortes[-1]} bytes -> {len(cortes)} partes")
 
 
 if __name__ == "__main__":
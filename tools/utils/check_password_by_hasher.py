@@ -3,20 +3,31 @@ import time
 import bcrypt
 from argon2 import PasswordHasher
 
+N = 50  # repeticiones por hasher: tiempo por operación, no una sola medida
+BCRYPT_ROUNDS = 12
+
 password = input("Escribe una 'contrasenia' para probar el rendimiento de la encryptacion. >>")
+password_bytes = password.encode()
 
+# time_cost / memory_cost ajustables para igualar el coste de bcrypt
 ph = PasswordHasher()
 
+# Calentamiento: carga de cffi y allocator fuera de la medida
+bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+ph.hash(password)
+
 # Benchmark bcrypt
-start = time.time()
-bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-bcrypt_time = time.time() - start
+start = time.perf_counter()
+for _ in range(N):
+    bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+bcrypt_time = (time.perf_counter() - start) / N
 
-# Benchmark Argon2  
-start = time.time()
-ph.hash(password)
-argon2_time = time.time() - start
+# Benchmark Argon2
+start = time.perf_counter()
+for _ in range(N):
+    ph.hash(password)
+argon2_time = (time.perf_counter() - start) / N
 
-print(f"bcrypt: {bcrypt_time:.3f}s")
-print(f"Argon2: {argon2_time:.3f}s")
+print(f"bcrypt (rounds={BCRYPT_ROUNDS}): {bcrypt_time:.3f}s/op ({1 / bcrypt_time:.1f} ops/s)")
+print(f"Argon2 (t={ph.time_cost}, m={ph.memory_cost} KiB): {argon2_time:.3f}s/op ({1 / argon2_time:.1f} ops/s)")
 print(f"Argon2 es {argon2_time/bcrypt_time:.1f}x más lento")